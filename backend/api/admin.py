@@ -1,14 +1,20 @@
 from django.contrib import admin
 from .models import (
-    Restaurant, Table, Stall, MenuItem, MenuItemTag, MenuItemIngredient,
-    Review, Order, OrderItem, Wallet, WalletTransaction, Notification
+    Restaurant, RestaurantHours, Table, Stall, MenuItem, MenuItemTag,
+    MenuItemIngredient, Review, Order, OrderItem, Wallet, WalletTransaction,
+    Notification
 )
 
+class RestaurantHoursInline(admin.TabularInline):
+    model = RestaurantHours
+    extra = 0
+
 @admin.register(Restaurant)
 class RestaurantAdmin(admin.ModelAdmin):
-    list_display = ('name', 'venue_type', 'city', 'is_active')
+    list_display = ('name', 'venue_type', 'city', 'timezone', 'is_active')
     list_filter = ('venue_type', 'is_active', 'city')
     search_fields = ('name', 'description', 'address')
+    inlines = [RestaurantHoursInline]
 
 @admin.register(Table)
 class TableAdmin(admin.ModelAdmin):
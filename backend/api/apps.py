@@ -2,4 +2,9 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api'
\ No newline at end of file
+    name = 'api'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals
+        post_migrate.connect(signals.install_search_backend, sender=self)
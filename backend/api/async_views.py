@@ -0,0 +1,164 @@
+import functools
+import json
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .conditional import acollection_state, aget_versions, apply_caching, make_etag
+from .models import Restaurant
+from .views import RestaurantViewSet, MenuItemViewSet
+from . import events, resolver, routing, snapshots
+
+HEARTBEAT_SECONDS = 15
+
+def _token_user_id(request):
+    # EventSource cannot set headers, so the access token may also arrive
+    # as ?token=. Validation is signature-only; no database round-trip.
+    token = request.GET.get('token')
+    header = request.headers.get('Authorization', '')
+    if not token and header.startswith('Bearer '):
+        token = header[len('Bearer '):]
+    if not token:
+        return None
+    try:
+        return AccessToken(token)[jwt_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+
+async def _event_source(user_id):
+    subscription = await events.get_broker().subscribe(events.user_channel(user_id))
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            event = await subscription.get(timeout=HEARTBEAT_SECONDS)
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+    finally:
+        await subscription.close()
+
+async def event_stream(request):
+    """
+    Server-Sent Events feed of order status changes and new notifications
+    for the authenticated user. Needs an ASGI server to stream.
+    """
+    if 'wsgi.version' in request.META:
+        return JsonResponse({'error': 'Event streaming requires the ASGI application'}, status=501)
+    user_id = _token_user_id(request)
+    if user_id is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+    response = StreamingHttpResponse(_event_source(user_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# Async twins of the catalogue reads. Under ASGI they wait on the database
+# and cache without holding a worker thread per request, so one process can
+# keep many slow clients open. They reuse the DRF viewsets for querysets,
+# filters and serializers; only the I/O goes through the async ORM and
+# cache. Responses match the sync endpoints.
+
+def _catalogue_view(view):
+    """
+    GET/HEAD only. Reads go to a replica unless the caller is pinned to the
+    primary (see ReplicaReadMixin), and API errors render as DRF would.
+    """
+    @require_safe
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        alias = None
+        if settings.DATABASE_REPLICAS and not await routing.ais_pinned(_token_user_id(request)):
+            alias = routing.choose_replica()
+        try:
+            with routing.reading_from(alias):
+                return await view(request, *args, **kwargs)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return JsonResponse(data, status=exc.status_code, safe=False)
+    return wrapper
+
+def _viewset(viewset_class, request, action, **kwargs):
+    # Never dispatched; it only builds querysets, validators and serializers.
+    return viewset_class(request=Request(request), args=(), kwargs=kwargs, action=action, format_kwarg=None)
+
+def _render(data):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json')
+
+async def _filtered_queryset(viewset):
+    for backend in viewset.filter_backends:
+        if hasattr(backend, 'aprefetch'):
+            await backend().aprefetch(viewset.request, viewset)
+    return viewset.filter_queryset(viewset.get_queryset())
+
+async def _conditional(request, viewset, render):
+    # ConditionalGetMixin._conditional on async cache and ORM calls.
+    try:
+        states = await acollection_state(viewset.get_validators())
+    except (ValueError, TypeError):
+        return await render()
+    versions = await aget_versions(viewset.get_version_scopes())
+    etag = make_etag(request.get_full_path(), 'json', versions, states)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = await render()
+    return apply_caching(response, etag, **viewset.cache_control)
+
+async def _list(request, viewset_class):
+    viewset = _viewset(viewset_class, request, 'list')
+    queryset = await _filtered_queryset(viewset)
+
+    async def render():
+        page = await viewset.paginator.apaginate_queryset(queryset, viewset.request)
+        serializer = viewset.get_serializer(page, many=True)
+        return _render(viewset.paginator.get_paginated_data(serializer.data))
+    return await _conditional(request, viewset, render)
+
+@_catalogue_view
+async def restaurant_list(request):
+    return await _list(request, RestaurantViewSet)
+
+@_catalogue_view
+async def restaurant_detail(request, pk):
+    viewset = _viewset(RestaurantViewSet, request, 'retrieve', pk=pk)
+    queryset = await _filtered_queryset(viewset)
+
+    async def render():
+        try:
+            restaurant = await queryset.aget(pk=pk)
+        except Restaurant.DoesNotExist:
+            raise NotFound('No Restaurant matches the given query.')
+        return _render(viewset.get_serializer(restaurant).data)
+    return await _conditional(request, viewset, render)
+
+@_catalogue_view
+async def restaurant_menu(request, pk):
+    etag = make_etag('menu', pk, snapshots.SNAPSHOT_SCHEMA, await snapshots.aget_version(pk))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            blob = await snapshots.aget_menu_snapshot(pk)
+        except Restaurant.DoesNotExist:
+            raise NotFound
+        response = HttpResponse(blob, content_type='application/json')
+    return apply_caching(response, etag, **RestaurantViewSet.cache_control)
+
+@_catalogue_view
+async def menu_item_list(request):
+    return await _list(request, MenuItemViewSet)
+
+@_catalogue_view
+async def table_resolve(request):
+    qr_code = request.GET.get('qr_code')
+    if not qr_code:
+        return JsonResponse({'error': 'qr_code is required'}, status=400)
+    session = await resolver.aresolve(qr_code, request)
+    if session is None:
+        raise NotFound
+    return _render(session)
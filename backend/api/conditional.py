@@ -0,0 +1,109 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+# Version scopes, bumped by api.signals whenever a row they cover changes.
+CATALOGUE = 'catalogue'
+TABLES = 'tables'
+
+def _version_key(scope):
+    return f'etag-version:{scope}'
+
+def _seed_version():
+    # Clock-based like the menu snapshot versions, so an evicted key never
+    # restarts at a value some client still holds an ETag for.
+    return time.time_ns() // 1000
+
+def get_versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            seed = _seed_version()
+            cache.add(key, seed, timeout=None)
+            versions[key] = cache.get(key, seed)
+    return [versions[key] for key in keys]
+
+async def aget_versions(scopes):
+    """get_versions() on async cache calls."""
+    keys = [_version_key(scope) for scope in scopes]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            seed = _seed_version()
+            await cache.aadd(key, seed, timeout=None)
+            versions[key] = await cache.aget(key, seed)
+    return [versions[key] for key in keys]
+
+def bump_version(scope):
+    try:
+        cache.incr(_version_key(scope))
+    except ValueError:
+        cache.add(_version_key(scope), _seed_version(), timeout=None)
+
+def collection_state(validators):
+    """
+    ETag parts for state that changes without a write: querysets are
+    counted (keep them on an index), other values are used as they are.
+    """
+    return [
+        validator.count() if isinstance(validator, QuerySet) else validator
+        for validator in validators
+    ]
+
+async def acollection_state(validators):
+    """collection_state() on the async ORM."""
+    return [
+        await validator.acount() if isinstance(validator, QuerySet) else validator
+        for validator in validators
+    ]
+
+def make_etag(*parts):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+def apply_caching(response, etag, **cache_control):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        patch_cache_control(response, **cache_control)
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+class ConditionalGetMixin:
+    """
+    Answer list/retrieve with 304 Not Modified before any serialization
+    happens. The ETag is built from the cached versions of the scopes the
+    response renders, so revalidating costs a cache read rather than a
+    query over the catalogue; get_validators() adds whatever changes
+    without a write.
+    """
+    cache_control = {'public': True, 'max_age': settings.API_CACHE_MAX_AGE}
+    version_scopes = (CATALOGUE,)
+
+    def get_version_scopes(self):
+        return list(self.version_scopes)
+
+    def get_validators(self):
+        return []
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
+
+    def _conditional(self, request, render):
+        try:
+            states = collection_state(self.get_validators())
+        except (ValueError, TypeError):
+            # Malformed lookup; let the regular handler produce the 404.
+            return render()
+        versions = get_versions(self.get_version_scopes())
+        etag = make_etag(request.get_full_path(), request.accepted_renderer.format, versions, states)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = render()
+        return apply_caching(response, etag, **self.cache_control)
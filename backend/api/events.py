@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+QUEUE_SIZE = 100
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+class InMemorySubscription:
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def deliver(self, event):
+        # Runs on the subscriber's loop; a client that cannot keep up loses
+        # events rather than growing the queue without bound.
+        if not self.queue.full():
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+class InMemoryBroker:
+    """
+    Single-process fan-out; enough for one node and for tests.
+    """
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+    async def subscribe(self, channel):
+        subscription = InMemorySubscription(self, channel)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+class RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+class RedisBroker:
+    def __init__(self, url):
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel, event):
+        self._client.publish(channel, json.dumps(event, cls=DjangoJSONEncoder))
+
+    async def subscribe(self, channel):
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+        return RedisSubscription(client, pubsub)
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                url = settings.EVENTS_BROKER_URL
+                _broker = RedisBroker(url) if url.startswith(('redis://', 'rediss://')) else InMemoryBroker()
+    return _broker
+
+def order_status_data(order_id, restaurant_id, status, updated_at):
+    return {
+        'id': order_id,
+        'restaurant': restaurant_id,
+        'status': status,
+        'updated_at': updated_at,
+    }
+
+def publish(user_id, event_type, data):
+    event = json.loads(json.dumps({'type': event_type, 'data': data}, cls=DjangoJSONEncoder))
+    get_broker().publish(user_channel(user_id), event)
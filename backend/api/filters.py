@@ -0,0 +1,70 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Case, When
+from django.utils import timezone
+from rest_framework.filters import BaseFilterBackend
+from .models import opening_timezones
+from .serializers import OpenHoursQuerySerializer
+from . import search
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Ranked search over api.search documents. Views declare which document
+    kind they expose with `search_kind`.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not search.parse_terms(query):
+            return queryset
+        # The ranked ids are kept for the request; the async views fetch
+        # them ahead of time in aprefetch().
+        cache = request.__dict__.setdefault('_search_results', {})
+        key = (view.search_kind, query)
+        if key not in cache:
+            cache[key] = search.search(view.search_kind, query, among=queryset)
+        object_ids = cache[key]
+        if not object_ids:
+            return queryset.none()
+        rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(object_ids)])
+        return queryset.filter(pk__in=object_ids).order_by(rank)
+
+    async def aprefetch(self, request, view):
+        """
+        Run the search ahead of filter_queryset() so an async view never
+        blocks on it; filter_queryset() then only builds SQL.
+        """
+        query = request.query_params.get(self.search_param, '')
+        cache = request.__dict__.setdefault('_search_results', {})
+        key = (view.search_kind, query)
+        if search.parse_terms(query) and key not in cache:
+            cache[key] = await sync_to_async(search.search)(view.search_kind, query, among=view.get_queryset())
+
+class OpenHoursFilter(BaseFilterBackend):
+    """
+    `?open_now=true` or `?open_at=<ISO 8601 datetime>`, answered in SQL from
+    the precomputed opening intervals.
+    """
+    def filter_queryset(self, request, queryset, view):
+        moment = self.moment(request)
+        if moment is None:
+            return queryset
+        return queryset.open_at(moment, zones=request.__dict__.get('_open_timezones'))
+
+    async def aprefetch(self, request, view):
+        if self.moment(request) is not None and '_open_timezones' not in request.__dict__:
+            request.__dict__['_open_timezones'] = [tz_name async for tz_name in opening_timezones()]
+
+    def moment(self, request):
+        """
+        The instant the request filters on, or None. open_now reads the
+        clock once per request so the ETag and the filter agree.
+        """
+        if '_open_moment' not in request.__dict__:
+            params = OpenHoursQuerySerializer(data=request.query_params)
+            params.is_valid(raise_exception=True)
+            moment = params.validated_data.get('open_at')
+            if moment is None and params.validated_data.get('open_now'):
+                moment = timezone.now()
+            request.__dict__['_open_moment'] = moment
+        return request.__dict__['_open_moment']
@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import MINUTES_PER_DAY, MINUTES_PER_WEEK, OpeningInterval, Restaurant, RestaurantHours, minute_of_week
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+def weekly_intervals(hours):
+    """
+    Turn (day, open_time, close_time) rows into sorted, merged
+    minute-of-week ranges. Hours that run past midnight spill into the next
+    day, and Sunday night wraps around to Monday morning.
+    """
+    ranges = []
+    for day, open_time, close_time in hours:
+        start = day * MINUTES_PER_DAY + _minutes(open_time)
+        end = day * MINUTES_PER_DAY + _minutes(close_time)
+        if end <= start:
+            end += MINUTES_PER_DAY
+        if end > MINUTES_PER_WEEK:
+            ranges += [(start, MINUTES_PER_WEEK), (0, end - MINUTES_PER_WEEK)]
+        else:
+            ranges.append((start, end))
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def is_open(intervals, tz_name, moment=None):
+    minute = minute_of_week(moment or timezone.now(), tz_name)
+    return any(start <= minute < end for start, end in intervals)
+
+def intervals_for(restaurant_id):
+    return list(
+        OpeningInterval.objects.filter(restaurant_id=restaurant_id)
+        .order_by('start_minute').values_list('start_minute', 'end_minute')
+    )
+
+@transaction.atomic
+def rebuild(restaurant_ids=None):
+    """
+    Recompute OpeningInterval rows. Restaurants without RestaurantHours
+    fall back to their daily opening_time/closing_time on all seven days.
+    """
+    restaurants = Restaurant.objects.all()
+    hours = RestaurantHours.objects.all()
+    intervals = OpeningInterval.objects.all()
+    if restaurant_ids is not None:
+        restaurants = restaurants.filter(pk__in=restaurant_ids)
+        hours = hours.filter(restaurant_id__in=restaurant_ids)
+        intervals = intervals.filter(restaurant_id__in=restaurant_ids)
+    weekly = {}
+    for restaurant_id, day, open_time, close_time in hours.values_list('restaurant_id', 'day', 'open_time', 'close_time'):
+        weekly.setdefault(restaurant_id, []).append((day, open_time, close_time))
+    rows = []
+    for restaurant_id, tz_name, opening_time, closing_time in restaurants.values_list(
+        'id', 'timezone', 'opening_time', 'closing_time'
+    ).iterator():
+        days = weekly.get(restaurant_id) or [(day, opening_time, closing_time) for day in range(7)]
+        rows += [
+            OpeningInterval(restaurant_id=restaurant_id, timezone=tz_name, start_minute=start, end_minute=end)
+            for start, end in weekly_intervals(days)
+        ]
+    intervals.delete()
+    OpeningInterval.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
@@ -0,0 +1,82 @@
+import functools
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+def _fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response(
+            {'error': 'Idempotency-Key was already used with a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(view_method):
+    """
+    Honor an Idempotency-Key header on a viewset action: the first response
+    is kept in the cache and replayed for retries of the same request.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {'error': 'Idempotency-Key must be at most 255 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        scope = f'{request.user.pk}:{request.method}:{request.path}:{key}'
+        cache_key = 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+        lock_key = cache_key + ':lock'
+        fingerprint = _fingerprint(request)
+
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+
+        # Concurrent duplicates queue behind a short lock and replay the
+        # winner's response once it lands.
+        deadline = time.monotonic() + LOCK_WAIT
+        while not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                return Response(
+                    {'error': 'A request with this Idempotency-Key is still in progress'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            time.sleep(LOCK_POLL_INTERVAL)
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+        try:
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code < 500:
+                cache.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, timeout=settings.IDEMPOTENCY_KEY_TTL)
+            return response
+        finally:
+            cache.delete(lock_key)
+    return wrapper
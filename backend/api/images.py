@@ -0,0 +1,124 @@
+import hashlib
+import io
+import logging
+import posixpath
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = 'derivatives'
+FORMATS = {
+    # format: (Pillow format, extension, save options)
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# model label -> image fields that get derivatives; each has a sibling
+# JSONField named '<field>_variants'.
+IMAGE_FIELDS = {
+    'api.restaurant': ('logo',),
+    'api.stall': ('logo',),
+    'api.menuitem': ('image',),
+}
+
+def variants_field(field_name):
+    return f'{field_name}_variants'
+
+def needs_variants(instance, field_name):
+    image = getattr(instance, field_name)
+    return bool(image) and getattr(instance, variants_field(field_name)).get('source') != image.name
+
+def _encode(image, fmt):
+    pil_format, _, options = FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA')
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+def _store(source_name, width, fmt, data):
+    # Content-hashed names never change meaning, so they can be cached
+    # forever and re-running the pipeline is a no-op.
+    stem = posixpath.splitext(posixpath.basename(source_name))[0]
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    name = posixpath.join(
+        DERIVATIVE_DIR, posixpath.dirname(source_name), f'{stem}-{width}w.{digest}.{FORMATS[fmt][1]}'
+    )
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+def build_variants(source_name):
+    """
+    Resize the stored image at source_name to every configured width up to
+    its own and return {'source': ..., 'webp': {width: name}, 'jpeg': {...}}.
+    """
+    with default_storage.open(source_name, 'rb') as handle:
+        original = ImageOps.exif_transpose(Image.open(handle))
+        original.load()
+    widths = [width for width in settings.IMAGE_DERIVATIVE_WIDTHS if width < original.width]
+    widths.append(min(original.width, max(settings.IMAGE_DERIVATIVE_WIDTHS)))
+    variants = {'source': source_name}
+    for width in sorted(set(widths)):
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.LANCZOS)
+        for fmt in FORMATS:
+            variants.setdefault(fmt, {})[str(width)] = _store(source_name, width, fmt, _encode(resized, fmt))
+    return variants
+
+def generate(model_label, pk, field_name):
+    """
+    Build derivatives for one instance and record them with a queryset
+    update, which skips post_save and so cannot re-trigger the pipeline.
+    Returns the instance when variants were written, otherwise None.
+    """
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not needs_variants(instance, field_name):
+        return None
+    source_name = getattr(instance, field_name).name
+    try:
+        variants = build_variants(source_name)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Could not build derivatives for %s %s.%s (%s)', model_label, pk, field_name, source_name)
+        return None
+    # Only record them if the image was not replaced meanwhile.
+    updated = model.objects.filter(pk=pk, **{field_name: source_name}).update(
+        **{variants_field(field_name): variants}
+    )
+    return instance if updated else None
+
+def srcset(variants, source_name, build_url):
+    """
+    {'webp': 'url 160w, url 320w', 'jpeg': ...} for the current image, or
+    None while derivatives are pending or belong to a replaced upload.
+    """
+    if not variants or variants.get('source') != source_name:
+        return None
+    return {
+        fmt: ', '.join(
+            f'{build_url(default_storage.url(name))} {width}w'
+            for width, name in sorted(variants[fmt].items(), key=lambda item: int(item[0]))
+        )
+        for fmt in FORMATS if variants.get(fmt)
+    }
+
+def absolutize(srcsets, build_url):
+    """Rewrite the relative URLs of a srcset() map, e.g. for a cached payload."""
+    if not srcsets:
+        return srcsets
+    return {
+        fmt: ', '.join(
+            f'{build_url(url)} {descriptor}'
+            for url, descriptor in (candidate.rsplit(' ', 1) for candidate in value.split(', '))
+        )
+        for fmt, value in srcsets.items()
+    }
@@ -0,0 +1,202 @@
+import bisect
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+class BudgetExceeded(Exception):
+    pass
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook; counts every statement on every alias.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+@contextlib.contextmanager
+def serializing():
+    """Attribute the enclosed work to serialization time of the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - started
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def as_dict(self):
+        cumulative, buckets = 0, {}
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'buckets': buckets, 'count': cumulative, 'sum': round(self.total, 3)}
+
+class EndpointStats:
+    def __init__(self):
+        self.duration_ms = Histogram(DURATION_BUCKETS_MS)
+        self.db_ms = Histogram(DURATION_BUCKETS_MS)
+        self.serialize_ms = Histogram(DURATION_BUCKETS_MS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.budget_violations = 0
+
+    def as_dict(self):
+        return {
+            'duration_ms': self.duration_ms.as_dict(),
+            'db_ms': self.db_ms.as_dict(),
+            'serialize_ms': self.serialize_ms.as_dict(),
+            'queries': self.queries.as_dict(),
+            'response_bytes': self.response_bytes.as_dict(),
+            'budget_violations': self.budget_violations,
+        }
+
+class MetricsRegistry:
+    """
+    Aggregates per process; each worker reports its own histograms, which
+    a scraper sums across workers.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, sample, violations):
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, EndpointStats())
+            stats.duration_ms.observe(sample['duration_ms'])
+            stats.db_ms.observe(sample['db_ms'])
+            stats.serialize_ms.observe(sample['serialize_ms'])
+            stats.queries.observe(sample['queries'])
+            if sample['bytes'] is not None:
+                stats.response_bytes.observe(sample['bytes'])
+            stats.budget_violations += len(violations)
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self._endpoints.items())}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+registry = MetricsRegistry()
+
+def get_budget(endpoint):
+    budgets = settings.API_BUDGETS
+    return budgets.get(endpoint, budgets.get('*', {}))
+
+def check_budget(endpoint, budget, sample):
+    violations = [
+        f'{limit}={sample[limit]} > {allowed}'
+        for limit, allowed in budget.items()
+        if sample.get(limit) is not None and sample[limit] > allowed
+    ]
+    if violations:
+        message = f'{endpoint} over budget: {", ".join(violations)}'
+        if settings.API_BUDGET_ACTION == 'raise':
+            raise BudgetExceeded(message)
+        logger.warning(message)
+    return violations
+
+class InstrumentationMiddleware:
+    """
+    Measures SQL count and time, serialization time, total time and
+    response size for every routed request, records them per endpoint and
+    checks them against settings.API_BUDGETS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with self._wrap_connections(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with self._wrap_connections(metrics):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    def _wrap_connections(self, metrics):
+        stack = contextlib.ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def _finish(self, request, response, metrics):
+        match = getattr(request, 'resolver_match', None)
+        # Unrouted requests and streams (SSE, CSV exports) are not sampled;
+        # their duration says nothing about the view.
+        if match is None or response.streaming:
+            return response
+        endpoint = f'{request.method} {match.view_name}'
+        sample = {
+            'duration_ms': round(metrics.duration * 1000, 3),
+            'db_ms': round(metrics.db_time * 1000, 3),
+            'serialize_ms': round(metrics.serialize_time * 1000, 3),
+            'queries': metrics.queries,
+            'bytes': len(response.content),
+        }
+        violations = check_budget(endpoint, get_budget(endpoint), sample)
+        registry.record(endpoint, sample, violations)
+        if settings.API_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={sample["db_ms"]};desc="{metrics.queries} queries", '
+                f'serialize;dur={sample["serialize_ms"]}, '
+                f'total;dur={sample["duration_ms"]}'
+            )
+        return response
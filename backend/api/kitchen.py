@@ -0,0 +1,131 @@
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Order, OrderItem
+from . import events
+
+ACTIVE_STATUSES = ('pending', 'preparing', 'ready')
+
+# Target status -> statuses an item may move from.
+TRANSITIONS = {
+    'preparing': ('pending',),
+    'ready': ('pending', 'preparing'),
+    'delivered': ('ready',),
+    'cancelled': ('pending', 'preparing'),
+}
+
+# Changes are re-sent for this long after the cursor so rows whose
+# transaction committed late are not skipped; clients upsert by id.
+CHANGES_OVERLAP = timedelta(seconds=2)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+def encode_cursor(moment, after_id=None):
+    """
+    A bare moment means "caught up": the next poll re-reads CHANGES_OVERLAP
+    before it. With after_id the client is mid-way through a burst and the
+    next page continues strictly after (moment, after_id).
+    """
+    value = str((moment - EPOCH) // MICROSECOND)
+    if after_id is not None:
+        value = f'{value}:{after_id}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        micros, _, after_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition(':')
+        return EPOCH + int(micros) * MICROSECOND, int(after_id) if after_id else None
+    except (ValueError, UnicodeDecodeError, OverflowError, OSError):
+        raise ValueError('Invalid cursor')
+
+def items_for(stall_id=None, restaurant_id=None):
+    items = OrderItem.objects.select_related('order__table', 'menu_item')
+    if stall_id is not None:
+        return items.filter(stall_id=stall_id)
+    return items.filter(restaurant_id=restaurant_id)
+
+def queue(items, statuses=ACTIVE_STATUSES, limit=200):
+    return list(items.filter(status__in=statuses).order_by('created_at', 'id')[:limit])
+
+def changes_since(items, cursor, limit=500):
+    """
+    Items changed after cursor, a decode_cursor() value or None, plus the
+    cursor for the next call. Bursts larger than limit are paged by
+    (updated_at, id) so the overlap window cannot pin the cursor in place.
+    """
+    if cursor is not None:
+        since, after_id = cursor
+        if after_id is None:
+            items = items.filter(updated_at__gt=since - CHANGES_OVERLAP)
+        else:
+            items = items.filter(Q(updated_at__gt=since) | Q(updated_at=since, id__gt=after_id))
+    changed = list(items.order_by('updated_at', 'id')[:limit + 1])
+    if len(changed) > limit:
+        changed = changed[:limit]
+        return changed, encode_cursor(changed[-1].updated_at, changed[-1].id)
+    if changed:
+        return changed, encode_cursor(changed[-1].updated_at)
+    return changed, encode_cursor(cursor[0] if cursor is not None else timezone.now())
+
+def _order_status(item_statuses):
+    live = item_statuses - {'cancelled'}
+    if not live:
+        return 'cancelled'
+    if live == {'delivered'}:
+        return 'delivered'
+    if live <= {'ready', 'delivered'}:
+        return 'ready'
+    if live & {'preparing', 'ready', 'delivered'}:
+        return 'preparing'
+    return None
+
+def _roll_up_orders(order_ids):
+    item_statuses = {}
+    for order_id, status in (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values_list('order_id', 'status').distinct()
+    ):
+        item_statuses.setdefault(order_id, set()).add(status)
+
+    changed = []
+    now = timezone.now()
+    orders = Order.objects.filter(pk__in=order_ids).values('id', 'user_id', 'restaurant_id', 'status')
+    for order in orders:
+        status = _order_status(item_statuses.get(order['id'], set()))
+        if status is not None and order['status'] not in (status, 'cancelled'):
+            order['status'] = status
+            order['updated_at'] = now
+            changed.append(order)
+
+    by_status = {}
+    for order in changed:
+        by_status.setdefault(order['status'], []).append(order['id'])
+    for status, ids in by_status.items():
+        Order.objects.filter(pk__in=ids).update(status=status, updated_at=now)
+    return changed
+
+@transaction.atomic
+def transition(item_ids, status):
+    """
+    Move every eligible item in item_ids to status in one UPDATE and roll
+    the owning orders forward. Returns the ids that actually moved.
+    """
+    from . import notifications
+    eligible = OrderItem.objects.select_for_update().filter(
+        pk__in=item_ids, status__in=TRANSITIONS[status]
+    )
+    moved = dict(eligible.values_list('id', 'order_id'))
+    if moved:
+        OrderItem.objects.filter(pk__in=moved).update(status=status, updated_at=timezone.now())
+        for order in _roll_up_orders(set(moved.values())):
+            data = events.order_status_data(
+                order['id'], order['restaurant_id'], order['status'], order['updated_at']
+            )
+            transaction.on_commit(lambda user_id=order['user_id'], data=data: events.publish(
+                user_id, 'order.status', data
+            ))
+            notifications.order_status_changed(order['user_id'], order['id'], order['status'])
+    return list(moved)
@@ -0,0 +1,103 @@
+import uuid
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from .models import Wallet, WalletTransaction, WalletCheckpoint
+
+CENT = Decimal('0.01')
+MAX_AMOUNT = Decimal('99999999.99')
+# Namespace for the reference_id of ledger entries that belong to an order.
+ORDER_NAMESPACE = uuid.UUID('7ba59eb7-a855-4a3a-81ac-a02b59e9c2d8')
+
+class InsufficientFunds(Exception):
+    pass
+
+def parse_amount(value):
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise ValueError('Invalid amount')
+    if not amount.is_finite() or amount <= 0 or amount > MAX_AMOUNT or amount != amount.quantize(CENT):
+        raise ValueError('Invalid amount')
+    return amount
+
+def credit(wallet_id, amount, description, reference_id=None):
+    return _apply(wallet_id, 'credit', amount, description, reference_id)
+
+def debit(wallet_id, amount, description, reference_id=None):
+    return _apply(wallet_id, 'debit', amount, description, reference_id)
+
+def order_reference(order_id):
+    return uuid.uuid5(ORDER_NAMESPACE, str(order_id))
+
+def refund_order(order_id):
+    """
+    Credit back the wallet payment for an order, if it has one and it has
+    not been refunded yet. Call it in the transaction that cancels the
+    order so the two commit together.
+    """
+    reference = order_reference(order_id)
+    entries = WalletTransaction.objects.filter(reference_id=reference)
+    payment = entries.filter(type='debit').first()
+    if payment is None or entries.filter(type='credit').exists():
+        return None
+    return credit(payment.wallet_id, payment.amount, f'Refund for order #{order_id}', reference)
+
+@transaction.atomic
+def _apply(wallet_id, type, amount, description, reference_id):
+    # The balance only ever moves through this single UPDATE, which also
+    # holds the row lock until the ledger entry below is committed with it.
+    wallets = Wallet.objects.filter(pk=wallet_id)
+    if type == 'debit':
+        updated = wallets.filter(balance__gte=amount).update(
+            balance=F('balance') - amount, updated_at=timezone.now()
+        )
+        if not updated:
+            raise InsufficientFunds('Insufficient wallet balance')
+    else:
+        updated = wallets.update(balance=F('balance') + amount, updated_at=timezone.now())
+        if not updated:
+            raise Wallet.DoesNotExist
+    return WalletTransaction.objects.create(
+        wallet_id=wallet_id,
+        type=type,
+        amount=amount,
+        description=description,
+        reference_id=reference_id,
+    )
+
+def reconcile(wallet):
+    """
+    Return (expected, actual) balances, where expected is the latest
+    checkpoint plus every ledger entry written after it.
+    """
+    checkpoint = wallet.checkpoints.order_by('-created_at', '-id').first()
+    start = checkpoint.balance if checkpoint else Decimal('0')
+    after = checkpoint.last_transaction_id if checkpoint else 0
+    totals = wallet.transactions.filter(pk__gt=after).aggregate(
+        credits=Sum('amount', filter=Q(type='credit')),
+        debits=Sum('amount', filter=Q(type='debit')),
+    )
+    expected = start + (totals['credits'] or 0) - (totals['debits'] or 0)
+    return expected, wallet.balance
+
+@transaction.atomic
+def checkpoint(wallet_id, force=False):
+    """
+    Record a checkpoint if the ledger agrees with the stored balance, or
+    unconditionally with force=True to adopt the stored balance as the new
+    baseline. Returns (checkpoint, expected, actual); checkpoint is None on
+    a mismatch.
+    """
+    wallet = Wallet.objects.select_for_update().get(pk=wallet_id)
+    expected, actual = reconcile(wallet)
+    if expected != actual and not force:
+        return None, expected, actual
+    last_transaction = wallet.transactions.order_by('-id').values_list('id', flat=True).first()
+    created = WalletCheckpoint.objects.create(
+        wallet=wallet,
+        balance=actual,
+        last_transaction_id=last_transaction or 0,
+    )
+    return created, expected, actual
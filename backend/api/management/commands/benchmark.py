@@ -0,0 +1,272 @@
+import json
+import random
+import re
+import time
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from api import kitchen
+from api.models import (
+    Restaurant, Table, Stall, MenuItem, Review, Order, OrderItem, Wallet,
+    WalletTransaction, Notification
+)
+from .generate_demo_data import DEMO_PREFIX
+
+SEARCH_TERMS = ['chicken', 'paneer', 'biryani', 'coffee', 'spicy', 'masala', 'pizza', 'lassi']
+# Async scenarios and the sync scenario serving the same response.
+ASYNC_COUNTERPARTS = {
+    'async_restaurant_list': 'restaurant_list',
+    'async_restaurant_detail': 'restaurant_detail',
+    'async_menu': 'menu',
+    'async_search': 'search',
+    'async_table_resolve': 'table_resolve',
+}
+# Plan lines that read a whole table rather than an index range.
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)$', re.MULTILINE),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = (
+        'Drive the main API endpoints in-process against the current database and '
+        'report throughput, latency percentiles and query counts. Run '
+        'generate_demo_data first. Writes are rolled back unless --keep is given. '
+        'async_* scenarios drive the /api/async/ views through the ASGI handler and '
+        'are compared with their sync counterparts; run serially in-process this '
+        'shows per-request overhead, not the concurrency an ASGI server gains.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per scenario.')
+        parser.add_argument('--scenario', action='append', dest='scenarios', help='Run only these scenarios.')
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--baseline', help='JSON file of an earlier run to compare against.')
+        parser.add_argument('--save', help='Write this run as a baseline JSON file.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Allowed p95 slowdown against the baseline before failing (0.2 = 20%%).'
+        )
+        parser.add_argument('--keep', action='store_true', help='Commit the orders and locks the run creates.')
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='EXPLAIN the hot viewset queries and fail if any of them scans a whole table.'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.restaurant_ids = list(Restaurant.objects.filter(is_active=True).values_list('id', flat=True))
+        self.wallets = list(Wallet.objects.filter(user__username__startswith=DEMO_PREFIX).values_list('id', 'user_id'))
+        if not self.restaurant_ids or not self.wallets:
+            raise CommandError('No demo data found; run generate_demo_data first.')
+        if options['explain']:
+            self.explain()
+        scenarios = self.scenarios()
+        names = options['scenarios'] or list(scenarios)
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}. Choose from {", ".join(scenarios)}.')
+
+        setup_test_environment()
+        try:
+            results = self.run(scenarios, names, options)
+        finally:
+            teardown_test_environment()
+
+        self.report(results)
+        self.report_async(results)
+        if options['save']:
+            with open(options['save'], 'w') as handle:
+                json.dump(results, handle, indent=2, sort_keys=True)
+            self.stdout.write(f'Saved baseline to {options["save"]}')
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                baseline = json.load(handle)
+            regressions = self.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s): {"; ".join(regressions)}')
+
+    def run(self, scenarios, names, options):
+        results = {}
+        try:
+            with transaction.atomic():
+                for name in names:
+                    results[name] = self.measure(scenarios[name], options['warmup'], options['requests'])
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def measure(self, scenario, warmup, count):
+        for _ in range(warmup):
+            scenario()
+        durations, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = scenario()
+                durations.append((time.perf_counter() - request_started) * 1000)
+            queries.append(len(captured))
+            if response.status_code >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        return {
+            'requests': count,
+            'errors': errors,
+            'rps': round(count / elapsed, 1),
+            'p50_ms': round(percentile(durations, 0.50), 2),
+            'p95_ms': round(percentile(durations, 0.95), 2),
+            'p99_ms': round(percentile(durations, 0.99), 2),
+            'queries_mean': round(sum(queries) / len(queries), 1),
+            'queries_max': max(queries),
+        }
+
+    def client_for(self, user_id):
+        return Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(User.objects.get(pk=user_id))}')
+
+    def scenarios(self):
+        rng = self.rng
+        anonymous = Client()
+        # One event loop per request; AsyncClient runs the ASGI handler.
+        async_get = async_to_sync(AsyncClient().get)
+        wallet_id, user_id = self.wallets[0]
+        customer = self.client_for(user_id)
+        menu_by_restaurant = {}
+        for pk, restaurant_id in MenuItem.objects.filter(available=True).values_list('id', 'restaurant_id'):
+            menu_by_restaurant.setdefault(restaurant_id, []).append(pk)
+        tables = list(Table.objects.filter(restaurant_id__in=menu_by_restaurant).values_list('id', 'restaurant_id'))
+        qr_codes = list(Table.objects.values_list('qr_code', flat=True))
+        lockable = [pk for pk, _ in tables]
+
+        def order_create():
+            table_id, restaurant_id = rng.choice(tables)
+            items = rng.sample(menu_by_restaurant[restaurant_id], k=min(2, len(menu_by_restaurant[restaurant_id])))
+            body = {
+                'restaurant': restaurant_id, 'table': table_id,
+                'items': [{'menu_item_id': pk, 'quantity': rng.randint(1, 3)} for pk in items],
+            }
+            return customer.post('/api/orders/', json.dumps(body), content_type='application/json')
+
+        def table_lock():
+            table_id = rng.choice(lockable)
+            response = anonymous.post(f'/api/tables/{table_id}/lock/')
+            if response.status_code == 200:
+                token = response.json()['lock_token']
+                anonymous.post(f'/api/tables/{table_id}/unlock/', {'lock_token': token})
+            return response
+
+        return {
+            'restaurant_list': lambda: anonymous.get('/api/restaurants/'),
+            'restaurants_open_now': lambda: anonymous.get('/api/restaurants/?open_now=true'),
+            'restaurant_detail': lambda: anonymous.get(f'/api/restaurants/{rng.choice(self.restaurant_ids)}/'),
+            'menu': lambda: anonymous.get(f'/api/restaurants/{rng.choice(self.restaurant_ids)}/menu/'),
+            'menu_items': lambda: anonymous.get('/api/menu-items/?ordering=-rating_avg&count=false'),
+            'search': lambda: anonymous.get(f'/api/menu-items/?search={rng.choice(SEARCH_TERMS)}'),
+            'order_create': order_create,
+            'order_list': lambda: customer.get('/api/orders/'),
+            'table_resolve': lambda: anonymous.get('/api/tables/resolve/', {'qr_code': rng.choice(qr_codes)}),
+            'async_restaurant_list': lambda: async_get('/api/async/restaurants/'),
+            'async_restaurant_detail': lambda: async_get(f'/api/async/restaurants/{rng.choice(self.restaurant_ids)}/'),
+            'async_menu': lambda: async_get(f'/api/async/restaurants/{rng.choice(self.restaurant_ids)}/menu/'),
+            'async_search': lambda: async_get(f'/api/async/menu-items/?search={rng.choice(SEARCH_TERMS)}'),
+            'async_table_resolve': lambda: async_get('/api/async/tables/resolve/', {'qr_code': rng.choice(qr_codes)}),
+            'table_lock': table_lock,
+            'wallet': lambda: customer.get(f'/api/wallet/{wallet_id}/'),
+            'wallet_transactions': lambda: customer.get(f'/api/wallet/{wallet_id}/transactions/'),
+            'notifications': lambda: customer.get('/api/notifications/'),
+            'unread_count': lambda: customer.get('/api/notifications/unread_count/'),
+        }
+
+    def hot_queries(self):
+        wallet_id, user_id = self.wallets[0]
+        restaurant_id = self.restaurant_ids[0]
+        stall_id = Stall.objects.values_list('id', flat=True).first()
+        menu_item_id = MenuItem.objects.values_list('id', flat=True).first()
+        return {
+            'restaurant_list': Restaurant.objects.filter(is_active=True).order_by('pk')[:10],
+            'restaurants_open_now': Restaurant.objects.filter(is_active=True).open_at(timezone.now()).order_by('pk')[:10],
+            'menu_item_list': MenuItem.objects.filter(available=True).order_by('pk')[:10],
+            'restaurant_menu': MenuItem.objects.filter(restaurant_id=restaurant_id, available=True),
+            'restaurant_tables': Table.objects.filter(restaurant_id=restaurant_id, is_available=True),
+            'menu_item_reviews': Review.objects.filter(menu_item_id=menu_item_id).order_by('-created_at', '-id')[:20],
+            'order_list': Order.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:20],
+            'order_items': OrderItem.objects.filter(order__user_id=user_id),
+            'kitchen_queue': OrderItem.objects.filter(stall_id=stall_id, status__in=kitchen.ACTIVE_STATUSES),
+            'kitchen_restaurant': OrderItem.objects.filter(restaurant_id=restaurant_id, status__in=kitchen.ACTIVE_STATUSES),
+            'notification_list': Notification.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:20],
+            'notification_unread': Notification.objects.filter(user_id=user_id, read=False),
+            'wallet_transactions': WalletTransaction.objects.filter(wallet_id=wallet_id).order_by('-created_at', '-id')[:20],
+            'expired_table_locks': Table.objects.expired_locks(),
+        }
+
+    def explain(self):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'--explain does not know how to read {connection.vendor} plans.')
+        failures = []
+        for name, queryset in self.hot_queries().items():
+            scanned = pattern.findall(queryset.explain())
+            # An unfiltered walk stops once the LIMIT is reached; a filtered
+            # one may read every row, so only the former is let through.
+            if queryset.query.high_mark is not None and not queryset.query.where:
+                scanned = [table for table in scanned if table != queryset.model._meta.db_table]
+            self.stdout.write(f'{name:<20} {"full scan of " + ", ".join(scanned) if scanned else "indexed"}')
+            if scanned:
+                failures.append(f'{name} scans {", ".join(scanned)}')
+        if failures:
+            raise CommandError(f'Full table scans: {"; ".join(failures)}')
+
+    def report(self, results):
+        header = f'{"scenario":<24} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8} {"errors":>7}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<24} {result["rps"]:>8} {result["p50_ms"]:>8} {result["p95_ms"]:>8} '
+                f'{result["p99_ms"]:>8} {result["queries_mean"]:>8} {result["errors"]:>7}'
+            )
+
+    def report_async(self, results):
+        pairs = [(name, sync) for name, sync in ASYNC_COUNTERPARTS.items() if name in results and sync in results]
+        if not pairs:
+            return
+        self.stdout.write('')
+        for name, sync in pairs:
+            asynchronous, synchronous = results[name], results[sync]
+            self.stdout.write(
+                f'{name:<24} p50 {synchronous["p50_ms"]} -> {asynchronous["p50_ms"]} ms, '
+                f'p95 {synchronous["p95_ms"]} -> {asynchronous["p95_ms"]} ms, '
+                f'req/s {synchronous["rps"]} -> {asynchronous["rps"]} (vs {sync})'
+            )
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            change = (result['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] if previous['p95_ms'] else 0
+            self.stdout.write(
+                f'{name:<24} p95 {previous["p95_ms"]} -> {result["p95_ms"]} ms ({change:+.0%}), '
+                f'queries {previous["queries_max"]} -> {result["queries_max"]}'
+            )
+            if change > tolerance:
+                regressions.append(f'{name} p95 {change:+.0%}')
+            if result['queries_max'] > previous['queries_max']:
+                regressions.append(f'{name} queries {previous["queries_max"]} -> {result["queries_max"]}')
+        return regressions
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from api import ledger
+from api.models import Wallet
+
+class Command(BaseCommand):
+    help = 'Reconcile wallet balances against the ledger and record checkpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Checkpoint mismatched wallets at their stored balance, e.g. to '
+                 'baseline wallets whose history predates the ledger.'
+        )
+
+    def handle(self, *args, **options):
+        checkpointed = mismatched = 0
+        for wallet_id in Wallet.objects.values_list('id', flat=True).iterator():
+            created, expected, actual = ledger.checkpoint(wallet_id, force=options['force'])
+            if expected != actual:
+                mismatched += 1
+                self.stderr.write(
+                    f'Wallet {wallet_id}: ledger says {expected}, balance is {actual}'
+                )
+            if created is not None:
+                checkpointed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Checkpointed {checkpointed} wallets, {mismatched} mismatched'
+        ))
@@ -0,0 +1,277 @@
+import random
+from datetime import time
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from api import conditional, hours, ledger, notifications, search, snapshots
+from api.models import (
+    Restaurant, RestaurantHours, Table, Stall, MenuItem, MenuItemTag, MenuItemIngredient,
+    Review, Order, OrderItem, Wallet, WalletTransaction, SearchDocument
+)
+
+DEMO_PREFIX = 'demo-'
+CITIES = [
+    ('Bengaluru', 'Karnataka', 'India', 'Asia/Kolkata', 12.9716, 77.5946),
+    ('Mumbai', 'Maharashtra', 'India', 'Asia/Kolkata', 19.0760, 72.8777),
+    ('Pune', 'Maharashtra', 'India', 'Asia/Kolkata', 18.5204, 73.8567),
+    ('Delhi', 'Delhi', 'India', 'Asia/Kolkata', 28.6139, 77.2090),
+    ('Dubai', 'Dubai', 'United Arab Emirates', 'Asia/Dubai', 25.2048, 55.2708),
+    ('London', 'England', 'United Kingdom', 'Europe/London', 51.5072, -0.1276),
+]
+NAME_PARTS = (
+    ['Spice', 'Saffron', 'Tandoor', 'Curry', 'Masala', 'Coastal', 'Urban', 'Royal', 'Green', 'Golden'],
+    ['Kitchen', 'House', 'Garden', 'Bistro', 'Junction', 'Table', 'Corner', 'Court', 'Express', 'Diner'],
+)
+CUISINES = ['North Indian', 'South Indian', 'Chinese', 'Italian', 'Street Food', 'Desserts', 'Beverages']
+DISHES = {
+    'Veg': ['Paneer Tikka', 'Masala Dosa', 'Veg Biryani', 'Margherita Pizza', 'Dal Makhani', 'Chole Bhature', 'Hakka Noodles'],
+    'NonVeg': ['Butter Chicken', 'Chicken Biryani', 'Fish Curry', 'Mutton Rogan Josh', 'Chicken 65', 'Prawn Fry'],
+    'Drink': ['Masala Chai', 'Cold Coffee', 'Mango Lassi', 'Fresh Lime Soda', 'Filter Coffee'],
+}
+SUB_CATEGORIES = ['Starters', 'Mains', 'Breads', 'Rice', 'Specials', 'Beverages']
+TAGS = ['spicy', 'bestseller', 'chef special', 'gluten free', 'vegan', 'new', 'healthy', 'kids']
+INGREDIENTS = ['paneer', 'chicken', 'rice', 'onion', 'tomato', 'garlic', 'ginger', 'butter', 'cream', 'coriander', 'chilli', 'mint']
+COMMENTS = ['Loved it', 'Good portion', 'A bit too spicy', 'Would order again', 'Average', 'Great value', 'Cold on arrival']
+ORDER_STATUSES = ['delivered'] * 6 + ['cancelled', 'pending', 'preparing', 'ready']
+
+class Command(BaseCommand):
+    help = (
+        'Generate deterministic demo data (restaurants, stalls, tables, menus, reviews, '
+        'orders, wallets and notifications) for local load tests and benchmarks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=20)
+        parser.add_argument('--stalls', type=int, default=4, help='Stalls per food court.')
+        parser.add_argument('--tables', type=int, default=12, help='Tables per restaurant.')
+        parser.add_argument('--items', type=int, default=40, help='Menu items per restaurant.')
+        parser.add_argument('--reviews', type=int, default=5, help='Upper bound of reviews per menu item.')
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=20, help='Orders per user.')
+        parser.add_argument('--transactions', type=int, default=30, help='Wallet transactions per user.')
+        parser.add_argument('--notifications', type=int, default=10, help='Notification batches sent to users.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--flush', action='store_true',
+            help=f'Delete previously generated demo rows (users and tables prefixed "{DEMO_PREFIX}") first.'
+        )
+
+    def handle(self, *args, **options):
+        if options['tables'] < 1:
+            raise CommandError('--tables must be at least 1; demo restaurants are found through their tables.')
+        rng = random.Random(options['seed'])
+        if options['flush']:
+            self._flush()
+        elif User.objects.filter(username__startswith=DEMO_PREFIX).exists():
+            raise CommandError('Demo data already exists; pass --flush to regenerate it.')
+
+        with transaction.atomic():
+            restaurants = self._restaurants(rng, options)
+            stalls = self._stalls(rng, restaurants, options['stalls'])
+            tables = self._tables(rng, restaurants, options['tables'])
+            self._hours(rng, restaurants)
+            menu_items = self._menu_items(rng, restaurants, stalls, options['items'])
+            users = self._users(options['users'])
+            reviews = self._reviews(rng, menu_items, users, options['reviews'])
+            MenuItem.objects.filter(restaurant__in=restaurants).rebuild_ratings()
+            orders = self._orders(rng, users, tables, menu_items, options['orders'])
+            transactions = self._wallets(rng, users, options['transactions'])
+            hours.rebuild([restaurant.pk for restaurant in restaurants])
+
+        # Bulk inserts skip the signals that maintain these derived stores.
+        connection = connections[router.db_for_write(SearchDocument)]
+        search.install(connection)
+        with transaction.atomic(using=connection.alias):
+            search.rebuild()
+        for restaurant in restaurants:
+            snapshots.invalidate(restaurant.pk)
+        conditional.bump_version(conditional.CATALOGUE)
+        conditional.bump_version(conditional.TABLES)
+        sent = 0
+        user_ids = [user.pk for user in users]
+        for batch in range(options['notifications']):
+            recipients = rng.sample(user_ids, k=max(1, len(user_ids) // 2))
+            sent += notifications.create_notifications(recipients, 'info', f'Demo announcement #{batch + 1}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(restaurants)} restaurants, {len(stalls)} stalls, {len(tables)} tables, '
+            f'{len(menu_items)} menu items, {reviews} reviews, {len(users)} users, {orders} orders, '
+            f'{transactions} wallet transactions and {sent} notifications'
+        ))
+
+    def _flush(self):
+        with transaction.atomic():
+            restaurant_ids = Table.objects.filter(qr_code__startswith=DEMO_PREFIX).values('restaurant_id')
+            Restaurant.objects.filter(pk__in=restaurant_ids).delete()
+            User.objects.filter(username__startswith=DEMO_PREFIX).delete()
+        connection = connections[router.db_for_write(SearchDocument)]
+        with transaction.atomic(using=connection.alias):
+            search.rebuild()
+
+    def _restaurants(self, rng, options):
+        restaurants = []
+        for index in range(options['restaurants']):
+            city, state, country, tz_name, latitude, longitude = rng.choice(CITIES)
+            name = f'{rng.choice(NAME_PARTS[0])} {rng.choice(NAME_PARTS[1])}'
+            restaurants.append(Restaurant(
+                name=f'{name} {index + 1}',
+                description=f'{rng.choice(CUISINES)} favourites in {city}',
+                logo='restaurants/demo.png',
+                venue_type='foodCourt' if index % 4 == 3 else 'restaurant',
+                country=country, state=state, city=city, timezone=tz_name,
+                address=f'{rng.randint(1, 300)} Demo Road, {city}',
+                latitude=Decimal(f'{latitude + rng.uniform(-0.1, 0.1):.6f}'),
+                longitude=Decimal(f'{longitude + rng.uniform(-0.1, 0.1):.6f}'),
+                opening_time=time(rng.choice([7, 8, 9, 11])),
+                closing_time=time(rng.choice([21, 22, 23])),
+            ))
+        return Restaurant.objects.bulk_create(restaurants)
+
+    def _stalls(self, rng, restaurants, per_court):
+        stalls = [
+            Stall(
+                restaurant=restaurant, name=f'{cuisine} Stall', logo='stalls/demo.png',
+                description=f'{cuisine} at {restaurant.name}', cuisine=cuisine,
+            )
+            for restaurant in restaurants if restaurant.venue_type == 'foodCourt'
+            for cuisine in rng.sample(CUISINES, k=min(per_court, len(CUISINES)))
+        ]
+        return Stall.objects.bulk_create(stalls)
+
+    def _tables(self, rng, restaurants, per_restaurant):
+        tables = [
+            Table(
+                restaurant=restaurant, number=number, seats=rng.choice([2, 4, 4, 6, 8]),
+                qr_code=f'{DEMO_PREFIX}{restaurant.pk}-{number}',
+                type=rng.choice(['private', 'private', 'shared']),
+            )
+            for restaurant in restaurants
+            for number in range(1, per_restaurant + 1)
+        ]
+        return Table.objects.bulk_create(tables)
+
+    def _hours(self, rng, restaurants):
+        # Half keep the fallback daily hours; the rest get weekly schedules,
+        # some with split shifts or late nights past midnight.
+        rows = []
+        for restaurant in rng.sample(restaurants, k=len(restaurants) // 2):
+            late_close = time(rng.choice([0, 1, 2]))
+            for day in range(7):
+                if rng.random() < 0.1:
+                    continue
+                if rng.random() < 0.3:
+                    rows += [
+                        RestaurantHours(restaurant=restaurant, day=day, open_time=time(11), close_time=time(15)),
+                        RestaurantHours(restaurant=restaurant, day=day, open_time=time(18), close_time=time(23)),
+                    ]
+                else:
+                    close_time = late_close if day in (4, 5) else time(22)
+                    rows.append(RestaurantHours(restaurant=restaurant, day=day, open_time=time(10), close_time=close_time))
+        RestaurantHours.objects.bulk_create(rows, batch_size=500)
+
+    def _menu_items(self, rng, restaurants, stalls, per_restaurant):
+        stalls_by_restaurant = {}
+        for stall in stalls:
+            stalls_by_restaurant.setdefault(stall.restaurant_id, []).append(stall)
+        menu_items = []
+        for restaurant in restaurants:
+            restaurant_stalls = stalls_by_restaurant.get(restaurant.pk, [None])
+            for index in range(per_restaurant):
+                category = rng.choice(['Veg', 'Veg', 'NonVeg', 'Drink'])
+                menu_items.append(MenuItem(
+                    restaurant=restaurant, stall=rng.choice(restaurant_stalls),
+                    name=f'{rng.choice(DISHES[category])} {index + 1}',
+                    description=f'House style, made with {" and ".join(rng.sample(INGREDIENTS, k=2))}',
+                    price=Decimal(rng.randrange(60, 600, 10)), category=category,
+                    sub_category='Beverages' if category == 'Drink' else rng.choice(SUB_CATEGORIES[:-1]),
+                    image='menu_items/demo.png', available=rng.random() > 0.05,
+                    preparation_time=rng.choice([5, 10, 15, 20, 30]), featured=rng.random() < 0.1,
+                    calories=rng.randrange(80, 900),
+                ))
+        menu_items = MenuItem.objects.bulk_create(menu_items, batch_size=500)
+        tags, ingredients = [], []
+        for menu_item in menu_items:
+            tags += [MenuItemTag(menu_item=menu_item, name=name) for name in rng.sample(TAGS, k=rng.randint(0, 3))]
+            ingredients += [
+                MenuItemIngredient(menu_item=menu_item, name=name)
+                for name in rng.sample(INGREDIENTS, k=rng.randint(2, 5))
+            ]
+        MenuItemTag.objects.bulk_create(tags, batch_size=500)
+        MenuItemIngredient.objects.bulk_create(ingredients, batch_size=500)
+        return menu_items
+
+    def _users(self, count):
+        password = make_password('demo')
+        users = [
+            User(username=f'{DEMO_PREFIX}{index + 1}', email=f'{DEMO_PREFIX}{index + 1}@example.com', password=password)
+            for index in range(count)
+        ]
+        return User.objects.bulk_create(users, batch_size=500)
+
+    def _reviews(self, rng, menu_items, users, max_per_item):
+        reviews = [
+            Review(menu_item=menu_item, user=user, rating=rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 5, 4])[0],
+                   comment=rng.choice(COMMENTS))
+            for menu_item in menu_items
+            for user in rng.sample(users, k=min(len(users), rng.randint(0, max_per_item)))
+        ]
+        return len(Review.objects.bulk_create(reviews, batch_size=500))
+
+    def _orders(self, rng, users, tables, menu_items, per_user):
+        if not users or not menu_items:
+            return 0
+        items_by_restaurant = {}
+        for menu_item in menu_items:
+            if menu_item.available:
+                items_by_restaurant.setdefault(menu_item.restaurant_id, []).append(menu_item)
+        tables = [table for table in tables if table.restaurant_id in items_by_restaurant]
+        orders, lines = [], []
+        for user in users:
+            for _ in range(per_user):
+                table = rng.choice(tables)
+                status = rng.choice(ORDER_STATUSES)
+                available = items_by_restaurant[table.restaurant_id]
+                chosen = rng.sample(available, k=min(len(available), rng.randint(1, 3)))
+                order_lines = []
+                for menu_item in chosen:
+                    quantity = rng.randint(1, 3)
+                    order_lines.append(OrderItem(
+                        restaurant_id=table.restaurant_id, menu_item=menu_item, stall_id=menu_item.stall_id,
+                        quantity=quantity,
+                        price=menu_item.price * quantity,
+                        status='pending' if status in ('pending', 'confirmed') else status,
+                    ))
+                orders.append(Order(
+                    user=user, restaurant_id=table.restaurant_id, table=table, status=status,
+                    total_amount=sum(line.price for line in order_lines),
+                ))
+                lines.append(order_lines)
+        orders = Order.objects.bulk_create(orders, batch_size=500)
+        for order, order_lines in zip(orders, lines):
+            for line in order_lines:
+                line.order = order
+        OrderItem.objects.bulk_create([line for order_lines in lines for line in order_lines], batch_size=500)
+        return len(orders)
+
+    def _wallets(self, rng, users, per_user):
+        wallets = Wallet.objects.bulk_create([Wallet(user=user) for user in users], batch_size=500)
+        entries = []
+        for wallet in wallets:
+            balance = Decimal('0')
+            for index in range(per_user):
+                if index == 0 or balance < 100 or rng.random() < 0.3:
+                    amount = Decimal(rng.choice([200, 500, 1000]))
+                    entries.append(WalletTransaction(wallet=wallet, type='credit', amount=amount, description='Wallet top-up'))
+                    balance += amount
+                else:
+                    amount = Decimal(rng.randrange(50, int(balance), 10))
+                    entries.append(WalletTransaction(wallet=wallet, type='debit', amount=amount, description='Order payment'))
+                    balance -= amount
+            wallet.balance = balance
+        WalletTransaction.objects.bulk_create(entries, batch_size=500)
+        Wallet.objects.bulk_update(wallets, ['balance'], batch_size=500)
+        for wallet in wallets:
+            ledger.checkpoint(wallet.pk)
+        return len(entries)
@@ -0,0 +1,24 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from api import images, tasks
+
+class Command(BaseCommand):
+    help = (
+        'Build the resized WebP/JPEG copies for every image that has none yet, '
+        'e.g. after changing IMAGE_DERIVATIVE_WIDTHS or for rows loaded without signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild images that already have variants.')
+
+    def handle(self, *args, **options):
+        built = 0
+        for model_label, field_names in images.IMAGE_FIELDS.items():
+            model = apps.get_model(model_label)
+            for field_name in field_names:
+                queryset = model.objects.exclude(**{field_name: ''})
+                if options['force']:
+                    queryset.update(**{images.variants_field(field_name): {}})
+                for pk in queryset.values_list('pk', flat=True).iterator():
+                    built += tasks.generate_image_variants(model_label, pk, field_name)
+        self.stdout.write(self.style.SUCCESS(f'Built variants for {built} images'))
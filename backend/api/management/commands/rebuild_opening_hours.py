@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api import conditional, hours
+
+class Command(BaseCommand):
+    help = 'Recompute the minute-of-week opening intervals behind the open_now/open_at filters.'
+
+    def handle(self, *args, **options):
+        count = hours.rebuild()
+        conditional.bump_version(conditional.CATALOGUE)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} opening intervals'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from api.models import MenuItem
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized review_count and rating_sum on every menu item.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--restaurant', type=int,
+            help='Only rebuild menu items belonging to this restaurant id.'
+        )
+
+    def handle(self, *args, **options):
+        menu_items = MenuItem.objects.all()
+        if options['restaurant']:
+            menu_items = menu_items.filter(restaurant_id=options['restaurant'])
+        updated = menu_items.rebuild_ratings()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {updated} menu items'))
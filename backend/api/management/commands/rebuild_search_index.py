@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, router, transaction
+from api import conditional, search
+from api.models import SearchDocument
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents for restaurants and menu items.'
+
+    def handle(self, *args, **options):
+        connection = connections[router.db_for_write(SearchDocument)]
+        search.install(connection)
+        with transaction.atomic(using=connection.alias):
+            count = search.rebuild()
+        conditional.bump_version(conditional.CATALOGUE)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} documents'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from api import conditional
+from api.models import Table
+
+class Command(BaseCommand):
+    help = 'Release table locks whose lease has expired.'
+
+    def handle(self, *args, **options):
+        released = Table.objects.release_expired_locks()
+        if released:
+            conditional.bump_version(conditional.TABLES)
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired table locks'))
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views import static
+from .images import DERIVATIVE_DIR
+
+def serve(request, path, document_root=None):
+    """
+    django.views.static.serve with caching headers. Derivatives have
+    content-hashed names, so a URL never changes meaning and browsers need
+    not revalidate; originals can be replaced in place and stay short-lived.
+    """
+    response = static.serve(request, path, document_root=document_root)
+    if path.startswith(f'{DERIVATIVE_DIR}/'):
+        patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def count_reviews(apps, schema_editor):
+    MenuItem = apps.get_model('api', 'MenuItem')
+    Review = apps.get_model('api', 'Review')
+    reviews = Review.objects.filter(menu_item=OuterRef('pk')).order_by().values('menu_item')
+    MenuItem.objects.update(
+        review_count=Coalesce(Subquery(reviews.annotate(c=Count('pk')).values('c')), 0),
+        rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum('rating')).values('s')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_reviews, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_menuitem_rating_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['menu_item', '-created_at'], name='api_review_menu_it_cfafa1_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_review_menu_item_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('restaurant', 'Restaurant'), ('menu_item', 'Menu Item')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.TextField()),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
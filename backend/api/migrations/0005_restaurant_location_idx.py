@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['latitude', 'longitude'], name='api_restaur_latitud_60ec88_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_table_lock_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_transaction_id', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='api.wallet')),
+            ],
+            options={
+                'get_latest_by': 'created_at',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_walletcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['wallet', 'created_at'], name='api_wallett_wallet__30aaff_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_wallettransaction_history_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('preparing', 'Preparing'), ('ready', 'Ready'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['stall', 'status', 'created_at'], name='api_orderit_stall_i_202293_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['stall', 'updated_at'], name='api_orderit_stall_i_b7946c_idx'),
+        ),
+    ]
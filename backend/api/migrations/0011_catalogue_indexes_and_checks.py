@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='wallettransaction',
+            name='api_wallett_wallet__30aaff_idx',
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['restaurant', 'available'], name='api_menuite_restaur_06e79f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(condition=models.Q(('available', True)), fields=['id'], name='menuitem_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read', False)), fields=['user', 'created_at'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='restaurant_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='table',
+            index=models.Index(fields=['restaurant', 'is_available'], name='api_table_restaur_111e06_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['wallet', 'created_at', 'id'], name='api_wallett_wallet__61e3e2_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='menuitem',
+            constraint=models.CheckConstraint(condition=models.Q(('price__gte', 0)), name='menuitem_price_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='menuitem',
+            constraint=models.CheckConstraint(condition=models.Q(('preparation_time__gte', 0)), name='menuitem_prep_time_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.CheckConstraint(condition=models.Q(('total_amount__gte', 0)), name='order_total_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity__gt', 0)), name='orderitem_quantity_positive'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.CheckConstraint(condition=models.Q(('price__gte', 0)), name='orderitem_price_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='restaurant',
+            constraint=models.CheckConstraint(condition=models.Q(('latitude__gte', -90), ('latitude__lte', 90), ('longitude__gte', -180), ('longitude__lte', 180)), name='restaurant_coordinates_valid'),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.CheckConstraint(condition=models.Q(('rating__gte', 1), ('rating__lte', 5)), name='review_rating_range'),
+        ),
+        migrations.AddConstraint(
+            model_name='table',
+            constraint=models.CheckConstraint(condition=models.Q(('seats__gt', 0)), name='table_seats_positive'),
+        ),
+        migrations.AddConstraint(
+            model_name='wallet',
+            constraint=models.CheckConstraint(condition=models.Q(('balance__gte', 0)), name='wallet_balance_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='wallettransaction',
+            constraint=models.CheckConstraint(condition=models.Q(('amount__gt', 0)), name='wallettransaction_amount_positive'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+import api.models
+import django.db.models.deletion
+from django.db import migrations, models
+from api.hours import weekly_intervals
+
+
+def open_daily_hours(apps, schema_editor):
+    # Until RestaurantHours are entered, restaurants keep their daily hours.
+    Restaurant = apps.get_model('api', 'Restaurant')
+    OpeningInterval = apps.get_model('api', 'OpeningInterval')
+    OpeningInterval.objects.bulk_create([
+        OpeningInterval(restaurant_id=pk, timezone=tz_name, start_minute=start, end_minute=end)
+        for pk, tz_name, opening_time, closing_time in Restaurant.objects.values_list(
+            'id', 'timezone', 'opening_time', 'closing_time'
+        ).iterator()
+        for start, end in weekly_intervals([(day, opening_time, closing_time) for day in range(7)])
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_catalogue_indexes_and_checks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='timezone',
+            field=models.CharField(default='UTC', max_length=64, validators=[api.models.validate_timezone]),
+        ),
+        migrations.CreateModel(
+            name='OpeningInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timezone', models.CharField(max_length=64)),
+                ('start_minute', models.PositiveIntegerField()),
+                ('end_minute', models.PositiveIntegerField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_intervals', to='api.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['timezone', 'start_minute', 'end_minute'], name='api_opening_timezon_588aa3_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_minute__lte', 10080), ('start_minute__lt', models.F('end_minute'))), name='openinginterval_valid_range')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RestaurantHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.IntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('open_time', models.TimeField()),
+                ('close_time', models.TimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hours', to='api.restaurant')),
+            ],
+            options={
+                'ordering': ['day', 'open_time'],
+                'constraints': [models.CheckConstraint(condition=models.Q(('day__gte', 0), ('day__lte', 6)), name='restauranthours_day_range')],
+            },
+        ),
+        migrations.RunPython(open_daily_hours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_order_restaurant(apps, schema_editor):
+    OrderItem = apps.get_model('api', 'OrderItem')
+    Order = apps.get_model('api', 'Order')
+    OrderItem.objects.filter(restaurant__isnull=True).update(
+        restaurant=Subquery(Order.objects.filter(pk=OuterRef('order_id')).values('restaurant_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_image_variants'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='orderitem',
+            name='api_orderit_stall_i_b7946c_idx',
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='restaurant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='api.restaurant'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['stall', 'updated_at', 'id'], name='api_orderit_stall_i_94f217_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['restaurant', 'status', 'created_at'], name='api_orderit_restaur_acd22a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['restaurant', 'updated_at', 'id'], name='api_orderit_restaur_bde9a1_idx'),
+        ),
+        migrations.RunPython(copy_order_restaurant, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='restaurant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='api.restaurant'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_orderitem_restaurant'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='table',
+            name='api_table_is_lock_18da4e_idx',
+        ),
+        migrations.AddIndex(
+            model_name='table',
+            index=models.Index(condition=models.Q(('is_locked', True)), fields=['locked_until'], name='table_locked_until_idx'),
+        ),
+    ]
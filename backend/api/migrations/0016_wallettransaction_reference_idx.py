@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_table_locked_until_partial_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['reference_id'], name='wallettransaction_ref_idx'),
+        ),
+    ]
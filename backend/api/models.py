@@ -1,7 +1,86 @@
+import math
+import zoneinfo
+from decimal import Decimal
 from django.db import models
+from django.utils import timezone
+from django.db.models import (
+    Count, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+)
+from django.db.models.functions import ASin, Cast, Coalesce, Cos, NullIf, Power, Radians, Sin, Sqrt
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.045
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+def validate_timezone(value):
+    try:
+        zoneinfo.ZoneInfo(value)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f'{value} is not a known time zone.')
+
+def minute_of_week(moment, tz_name):
+    local = moment.astimezone(zoneinfo.ZoneInfo(tz_name))
+    return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+class RestaurantQuerySet(models.QuerySet):
+    def within_bounds(self, latitude, longitude, radius_km):
+        # Cheap bounding-box prefilter that the (latitude, longitude) index
+        # can serve; callers refine it with the exact distance annotation.
+        lat_delta = radius_km / KM_PER_DEGREE
+        queryset = self.filter(
+            latitude__gte=Decimal(str(latitude - lat_delta)),
+            latitude__lte=Decimal(str(latitude + lat_delta)),
+        )
+        cos_lat = math.cos(math.radians(latitude))
+        if cos_lat > 0.01:
+            lng_delta = radius_km / (KM_PER_DEGREE * cos_lat)
+            if -180 <= longitude - lng_delta and longitude + lng_delta <= 180:
+                queryset = queryset.filter(
+                    longitude__gte=Decimal(str(longitude - lng_delta)),
+                    longitude__lte=Decimal(str(longitude + lng_delta)),
+                )
+        return queryset
+
+    def with_distance(self, latitude, longitude):
+        # Haversine in SQL, built from functions Django provides on both
+        # SQLite and PostgreSQL.
+        lat = Radians(Cast('latitude', FloatField()))
+        lng = Radians(Cast('longitude', FloatField()))
+        origin_lat = math.radians(latitude)
+        origin_lng = math.radians(longitude)
+        a = (
+            Power(Sin((lat - Value(origin_lat)) / 2), 2)
+            + Value(math.cos(origin_lat)) * Cos(lat) * Power(Sin((lng - Value(origin_lng)) / 2), 2)
+        )
+        return self.annotate(
+            distance=ExpressionWrapper(2 * EARTH_RADIUS_KM * ASin(Sqrt(a)), output_field=FloatField())
+        )
+
+    def nearby(self, latitude, longitude, radius_km):
+        return (
+            self.within_bounds(latitude, longitude, radius_km)
+            .with_distance(latitude, longitude)
+            .filter(distance__lte=radius_km)
+        )
+
+    def open_at(self, moment, zones=None):
+        # One range predicate per distinct time zone: the local minute of
+        # the week is the same for every restaurant sharing a zone. Async
+        # callers fetch opening_timezones() themselves and pass it in.
+        if zones is None:
+            zones = opening_timezones()
+        condition = Q()
+        for tz_name in zones:
+            minute = minute_of_week(moment, tz_name)
+            condition |= Q(timezone=tz_name, start_minute__lte=minute, end_minute__gt=minute)
+        if not condition:
+            return self.none()
+        return self.filter(pk__in=OpeningInterval.objects.filter(condition).values('restaurant_id'))
+
 class Restaurant(models.Model):
     VENUE_TYPES = [
         ('restaurant', 'Restaurant'),
@@ -11,6 +90,8 @@ class Restaurant(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     logo = models.ImageField(upload_to='restaurants/')
+    # Resized copies of logo; written by api.images after each upload.
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     venue_type = models.CharField(max_length=20, choices=VENUE_TYPES)
     country = models.CharField(max_length=100, blank=True)
     state = models.CharField(max_length=100, blank=True)
@@ -18,15 +99,130 @@ class Restaurant(models.Model):
     address = models.TextField()
     latitude = models.DecimalField(max_digits=10, decimal_places=8)
     longitude = models.DecimalField(max_digits=11, decimal_places=8)
+    # Fallback daily hours for restaurants without RestaurantHours rows.
     opening_time = models.TimeField()
     closing_time = models.TimeField()
+    timezone = models.CharField(max_length=64, default='UTC', validators=[validate_timezone])
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RestaurantQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude']),
+            models.Index(fields=['id'], condition=Q(is_active=True), name='restaurant_active_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(latitude__gte=-90, latitude__lte=90, longitude__gte=-180, longitude__lte=180),
+                name='restaurant_coordinates_valid',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+class RestaurantHours(models.Model):
+    DAYS = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='hours')
+    day = models.IntegerField(choices=DAYS)
+    # A close_time at or before open_time runs past midnight into the next day.
+    open_time = models.TimeField()
+    close_time = models.TimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['day', 'open_time']
+        constraints = [
+            models.CheckConstraint(condition=Q(day__gte=0, day__lte=6), name='restauranthours_day_range'),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant.name} - {self.get_day_display()} {self.open_time}-{self.close_time}"
+
+class OpeningInterval(models.Model):
+    # Derived from RestaurantHours (or the fallback daily hours) by
+    # api.hours.rebuild; minutes of the week in the restaurant's local time,
+    # Monday 00:00 = 0, end exclusive.
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='opening_intervals')
+    timezone = models.CharField(max_length=64)
+    start_minute = models.PositiveIntegerField()
+    end_minute = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timezone', 'start_minute', 'end_minute']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(start_minute__lt=F('end_minute'), end_minute__lte=MINUTES_PER_WEEK),
+                name='openinginterval_valid_range',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id}: {self.start_minute}-{self.end_minute} {self.timezone}"
+
+def opening_timezones():
+    return OpeningInterval.objects.order_by('timezone').values_list('timezone', flat=True).distinct()
+
+def _lapsed(now):
+    # Locks taken before leases existed have no locked_until; nobody can
+    # renew or release them by token, so they count as lapsed.
+    return Q(locked_until__lt=now) | Q(locked_until__isnull=True)
+
+class TableQuerySet(models.QuerySet):
+    # All lock transitions are single conditional UPDATEs touching only the
+    # lock columns; the returned row count tells the caller whether it won.
+    def acquire_lock(self, token, locked_until, user=None):
+        now = timezone.now()
+        return self.filter(Q(is_locked=False) | _lapsed(now)).update(
+            is_locked=True,
+            lock_token=token,
+            locked_by=user,
+            locked_until=locked_until,
+            updated_at=now,
+        )
+
+    def renew_lock(self, token, locked_until):
+        return self.filter(is_locked=True, lock_token=token).update(
+            locked_until=locked_until,
+            updated_at=timezone.now(),
+        )
+
+    def release_lock(self, token=None):
+        queryset = self.filter(is_locked=True)
+        if token is not None:
+            queryset = queryset.filter(lock_token=token)
+        return queryset._clear_lock()
+
+    def expired_locks(self):
+        return self.filter(_lapsed(timezone.now()), is_locked=True)
+
+    def release_expired_locks(self):
+        return self.expired_locks()._clear_lock()
+
+    def _clear_lock(self):
+        return self.update(
+            is_locked=False,
+            lock_token=None,
+            locked_by=None,
+            locked_until=None,
+            updated_at=timezone.now(),
+        )
+
 class Table(models.Model):
     TABLE_TYPES = [
         ('private', 'Private'),
@@ -40,20 +236,39 @@ class Table(models.Model):
     type = models.CharField(max_length=20, choices=TABLE_TYPES)
     is_available = models.BooleanField(default=True)
     is_locked = models.BooleanField(default=False)
+    lock_token = models.UUIDField(null=True, blank=True, editable=False)
+    locked_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    locked_until = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TableQuerySet.as_manager()
+
     class Meta:
         unique_together = ['restaurant', 'number']
+        indexes = [
+            # Partial: SQLite cannot use an index on a bare boolean column
+            # for is_locked=True, and only locked rows are ever swept.
+            models.Index(fields=['locked_until'], condition=Q(is_locked=True), name='table_locked_until_idx'),
+            models.Index(fields=['restaurant', 'is_available']),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=Q(seats__gt=0), name='table_seats_positive'),
+        ]
 
     def __str__(self):
         return f"{self.restaurant.name} - Table {self.number}"
 
+    @property
+    def lock_active(self):
+        return self.is_locked and self.locked_until is not None and self.locked_until >= timezone.now()
+
 class Stall(models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='stalls')
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     logo = models.ImageField(upload_to='stalls/')
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     cuisine = models.CharField(max_length=100)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -62,6 +277,31 @@ class Stall(models.Model):
     def __str__(self):
         return f"{self.name} at {self.restaurant.name}"
 
+class MenuItemQuerySet(models.QuerySet):
+    def with_rating(self):
+        return self.annotate(
+            rating_avg=Cast('rating_sum', FloatField()) / NullIf('review_count', 0),
+        )
+
+    def adjust_rating(self, count_delta, rating_delta):
+        return self.update(
+            review_count=F('review_count') + count_delta,
+            rating_sum=F('rating_sum') + rating_delta,
+            updated_at=timezone.now(),
+        )
+
+    def rebuild_ratings(self):
+        reviews = Review.objects.filter(menu_item=OuterRef('pk')).order_by().values('menu_item')
+        return self.update(
+            review_count=Coalesce(Subquery(reviews.annotate(c=Count('pk')).values('c')), 0),
+            rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum('rating')).values('s')), 0),
+            updated_at=timezone.now(),
+        )
+
+    def for_serializer(self, tags=True, ingredients=True):
+        lookups = [name for name, wanted in (('tags', tags), ('ingredients', ingredients)) if wanted]
+        return self.prefetch_related(*lookups)
+
 class MenuItem(models.Model):
     CATEGORIES = [
         ('Veg', 'Vegetarian'),
@@ -77,6 +317,7 @@ class MenuItem(models.Model):
     category = models.CharField(max_length=20, choices=CATEGORIES)
     sub_category = models.CharField(max_length=100)
     image = models.ImageField(upload_to='menu_items/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     available = models.BooleanField(default=True)
     preparation_time = models.IntegerField(help_text='Preparation time in minutes')
     featured = models.BooleanField(default=False)
@@ -84,12 +325,47 @@ class MenuItem(models.Model):
     protein = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     carbs = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     fat = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    # Maintained from Review signals; see MenuItemQuerySet.adjust_rating.
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MenuItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['restaurant', 'available']),
+            models.Index(fields=['id'], condition=Q(available=True), name='menuitem_available_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=Q(price__gte=0), name='menuitem_price_non_negative'),
+            models.CheckConstraint(condition=Q(preparation_time__gte=0), name='menuitem_prep_time_non_negative'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Never write the rating aggregates back from a possibly stale
+        # instance; they only move through adjust_rating/rebuild_ratings.
+        # Deferred fields stay out too, as in Model.save(), so saving an
+        # only() instance does not load them one query at a time.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+                and field.name not in ('review_count', 'rating_sum')
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def rating(self):
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
 class MenuItemTag(models.Model):
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='tags')
     name = models.CharField(max_length=100)
@@ -122,6 +398,12 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ['menu_item', 'user']
+        indexes = [
+            models.Index(fields=['menu_item', '-created_at']),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=Q(rating__gte=1, rating__lte=5), name='review_rating_range'),
+        ]
 
     def __str__(self):
         return f"{self.menu_item.name} - {self.user.username}"
@@ -145,17 +427,57 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=Q(total_amount__gte=0), name='order_total_non_negative'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so post_save can tell whether the status moved.
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
 class OrderItem(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('preparing', 'Preparing'),
+        ('ready', 'Ready'),
+        ('delivered', 'Delivered'),
+        ('cancelled', 'Cancelled'),
+    ]
+
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    # Copied from the order so restaurant-wide kitchen queues (plain
+    # restaurants have no stalls) get their own index.
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='order_items')
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     stall = models.ForeignKey(Stall, on_delete=models.CASCADE, null=True, blank=True)
     quantity = models.IntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     special_instructions = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['stall', 'status', 'created_at']),
+            models.Index(fields=['stall', 'updated_at', 'id']),
+            models.Index(fields=['restaurant', 'status', 'created_at']),
+            models.Index(fields=['restaurant', 'updated_at', 'id']),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=Q(quantity__gt=0), name='orderitem_quantity_positive'),
+            models.CheckConstraint(condition=Q(price__gte=0), name='orderitem_price_non_negative'),
+        ]
 
     def __str__(self):
         return f"{self.order.id} - {self.menu_item.name}"
@@ -167,6 +489,12 @@ class Wallet(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # Backstop for ledger.debit's conditional update.
+            models.CheckConstraint(condition=Q(balance__gte=0), name='wallet_balance_non_negative'),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s Wallet"
 
@@ -183,9 +511,32 @@ class WalletTransaction(models.Model):
     reference_id = models.UUIDField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet', 'created_at', 'id']),
+            models.Index(fields=['reference_id'], name='wallettransaction_ref_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=Q(amount__gt=0), name='wallettransaction_amount_positive'),
+        ]
+
     def __str__(self):
         return f"{self.wallet.user.username} - {self.type} - {self.amount}"
 
+class WalletCheckpoint(models.Model):
+    # Verified balance as of last_transaction_id; reconciliation only sums
+    # the ledger entries written after it.
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='checkpoints')
+    balance = models.DecimalField(max_digits=10, decimal_places=2)
+    last_transaction_id = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        get_latest_by = 'created_at'
+
+    def __str__(self):
+        return f"{self.wallet.user.username} - {self.balance} @ {self.created_at}"
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('info', 'Information'),
@@ -200,5 +551,31 @@ class Notification(models.Model):
     read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['user', 'created_at'], condition=Q(read=False), name='notification_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.type}"
+
+class SearchDocument(models.Model):
+    KINDS = [
+        ('restaurant', 'Restaurant'),
+        ('menu_item', 'Menu Item'),
+    ]
+
+    # Flattened text for one searchable object; maintained by api.search and
+    # indexed by the database-specific full-text backend.
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.BigIntegerField()
+    title = models.TextField()
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+
     def __str__(self):
-        return f"{self.user.username} - {self.type}"
\ No newline at end of file
+        return f"{self.kind} #{self.object_id} - {self.title}"
\ No newline at end of file
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.db import transaction
+from .models import Notification
+from .serializers import NotificationSerializer
+from . import events
+
+CHUNK_SIZE = 500
+# Order status -> (notification type, message) sent to the customer.
+ORDER_STATUS_MESSAGES = {
+    'preparing': ('info', 'Your order #{order_id} is being prepared.'),
+    'ready': ('success', 'Your order #{order_id} is ready.'),
+    'delivered': ('success', 'Your order #{order_id} has been delivered.'),
+    'cancelled': ('warning', 'Your order #{order_id} has been cancelled.'),
+}
+# The counter is only a cache of COUNT(*); expiring it bounds any drift.
+UNREAD_COUNTER_TIMEOUT = 60 * 60
+
+def _unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+def unread_count(user_id):
+    count = cache.get(_unread_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, read=False).count()
+        cache.add(_unread_key(user_id), count, timeout=UNREAD_COUNTER_TIMEOUT)
+    return count
+
+def adjust_unread(user_id, delta):
+    if not delta:
+        return
+    try:
+        if cache.incr(_unread_key(user_id), delta) < 0:
+            cache.delete(_unread_key(user_id))
+    except ValueError:
+        # Not cached yet; the next read counts from the table.
+        pass
+
+def create_notifications(user_ids, type, message):
+    """
+    Write one notification per user in bulk chunks. Bulk inserts skip model
+    signals, so counters and push events are handled here.
+    """
+    created = []
+    user_ids = list(dict.fromkeys(user_ids))
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        chunk = [
+            Notification(user_id=user_id, type=type, message=message)
+            for user_id in user_ids[start:start + CHUNK_SIZE]
+        ]
+        with transaction.atomic():
+            created += Notification.objects.bulk_create(chunk)
+    for notification in created:
+        adjust_unread(notification.user_id, 1)
+        events.publish(notification.user_id, 'notification', NotificationSerializer(notification).data)
+    return len(created)
+
+def notify(user_ids, type, message):
+    """
+    Queue "notify these users" on the background worker once the caller's
+    transaction commits.
+    """
+    from .tasks import notify_users
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: notify_users.delay(user_ids, type, message))
+
+def order_status_changed(user_id, order_id, status):
+    type, message = ORDER_STATUS_MESSAGES[status]
+    notify([user_id], type, message.format(order_id=order_id))
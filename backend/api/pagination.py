@@ -0,0 +1,121 @@
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+class CheckedCursorPagination(CursorPagination):
+    """
+    A cursor whose position does not parse as the ordering field is as
+    invalid as one that does not decode; answer both with a 404.
+    """
+    def paginate_queryset(self, queryset, request, view=None):
+        try:
+            return super().paginate_queryset(queryset, request, view)
+        except (ValidationError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+class CreatedAtCursorPagination(CheckedCursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class DistanceCursorPagination(CheckedCursorPagination):
+    ordering = 'distance'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class CataloguePagination(PageNumberPagination):
+    """
+    Page numbers for the public catalogue, where clients jump between pages
+    and sort by arbitrary fields. `?count=false` skips the COUNT(*) and
+    probes one row past the page to decide whether there is a next one.
+    Async views paginate through apaginate_queryset().
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.include_count = self._include_count(request)
+        self.page = None
+        if self.include_count:
+            return super().paginate_queryset(queryset, request, view)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.page_number = self._page_number(request)
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.request = request
+        return rows[:page_size]
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset() for async views, on the async ORM."""
+        self.include_count = self._include_count(request)
+        self.page = None
+        page_size = self.get_page_size(request) or api_settings.PAGE_SIZE
+        self.page_number = self._page_number(request)
+        offset = (self.page_number - 1) * page_size
+        if self.include_count:
+            self.count = await queryset.acount()
+            if offset and offset >= self.count:
+                raise NotFound(self.invalid_page_message.format(
+                    page_number=self.page_number, message='That page contains no results'
+                ))
+            rows = [row async for row in queryset[offset:offset + page_size]]
+            self.has_next = offset + page_size < self.count
+        else:
+            rows = [row async for row in queryset[offset:offset + page_size + 1]]
+            self.has_next = len(rows) > page_size
+        self.request = request
+        return rows[:page_size]
+
+    def _include_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() not in ('0', 'false', 'no')
+
+    def _page_number(self, request):
+        try:
+            page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            page_number = 0
+        if page_number < 1:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=request.query_params.get(self.page_query_param), message='Invalid page.'
+            ))
+        return page_number
+
+    def get_paginated_data(self, data):
+        paginated = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.include_count:
+            count = self.page.paginator.count if self.page is not None else self.count
+            paginated = {'count': count, **paginated}
+        return paginated
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_next_link(self):
+        if self.page is not None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page is not None:
+            return super().get_previous_link()
+        if self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
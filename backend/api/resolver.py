@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .models import Table
+from .serializers import RestaurantSummarySerializer, TableSummarySerializer
+from . import hours, images, routing, snapshots
+
+class LRUCache:
+    """
+    Small thread-safe LRU with a per-entry TTL. Lives in process memory, so
+    each worker holds its own copy; invalidation reaches only the worker
+    that saw the write and the TTL bounds staleness everywhere else.
+    """
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [key for key, (_, value) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+_tables = LRUCache(settings.TABLE_RESOLVE_CACHE_SIZE, settings.TABLE_RESOLVE_CACHE_TTL)
+
+def _load(qr_code):
+    with routing.primary():
+        table = (
+            Table.objects.select_related('restaurant')
+            .filter(qr_code=qr_code, restaurant__is_active=True)
+            .first()
+        )
+        if table is None:
+            return None
+        restaurant = table.restaurant
+        opening_intervals = hours.intervals_for(restaurant.pk)
+    return {
+        'table': TableSummarySerializer(table).data,
+        'restaurant': RestaurantSummarySerializer(restaurant).data,
+        'restaurant_id': restaurant.pk,
+        'timezone': restaurant.timezone,
+        'opening_intervals': opening_intervals,
+        'menu_version': snapshots.get_version(restaurant.pk),
+    }
+
+def resolve(qr_code, request=None):
+    """
+    Everything a diner session needs after scanning a table's QR code.
+    Lock state is left out: locks move through queryset updates that the
+    cache never hears about, and POST /tables/{id}/lock/ is authoritative.
+    """
+    entry = _tables.get(qr_code)
+    if entry is not None:
+        # Restaurant writes bump the shared menu version, which also catches
+        # edits made through other workers.
+        menu_version = snapshots.get_version(entry['restaurant_id'])
+        if menu_version != entry['menu_version']:
+            entry = None
+    if entry is None:
+        entry = _load(qr_code)
+        if entry is None:
+            return None
+        _tables.set(qr_code, entry)
+        menu_version = entry['menu_version']
+    return _session(entry, menu_version, request)
+
+async def aresolve(qr_code, request=None):
+    """resolve() for async views; a warm entry costs one async cache read."""
+    entry = _tables.get(qr_code)
+    if entry is not None:
+        menu_version = await snapshots.aget_version(entry['restaurant_id'])
+        if menu_version != entry['menu_version']:
+            entry = None
+    if entry is None:
+        entry = await sync_to_async(_load)(qr_code)
+        if entry is None:
+            return None
+        _tables.set(qr_code, entry)
+        menu_version = entry['menu_version']
+    return _session(entry, menu_version, request)
+
+def _session(entry, menu_version, request):
+    restaurant = entry['restaurant']
+    if request is not None and restaurant['logo']:
+        # Cached without a request so one entry serves every host.
+        restaurant = {
+            **restaurant,
+            'logo': request.build_absolute_uri(restaurant['logo']),
+            'logo_srcset': images.absolutize(restaurant['logo_srcset'], request.build_absolute_uri),
+        }
+    return {
+        'table': entry['table'],
+        'restaurant': restaurant,
+        'is_open': hours.is_open(entry['opening_intervals'], entry['timezone']),
+        'menu_version': menu_version,
+    }
+
+def invalidate_table(table_id):
+    _tables.delete_where(lambda entry: entry['table']['id'] == table_id)
+
+def invalidate_restaurant(restaurant_id):
+    _tables.delete_where(lambda entry: entry['restaurant_id'] == restaurant_id)
@@ -0,0 +1,75 @@
+import contextlib
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# Alias the current request may read from; None means the primary.
+_read_alias = ContextVar('read_alias', default=None)
+
+def _pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+def pin_to_primary(user_id):
+    """Keep the user's reads on the primary until replicas have caught up."""
+    cache.set(_pin_key(user_id), 1, timeout=settings.DATABASE_REPLICA_PIN_SECONDS)
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+
+async def ais_pinned(user_id):
+    return user_id is not None and await cache.aget(_pin_key(user_id)) is not None
+
+def choose_replica():
+    return random.choice(settings.DATABASE_REPLICAS) if settings.DATABASE_REPLICAS else None
+
+@contextlib.contextmanager
+def reading_from(alias):
+    """Send reads inside the block to alias (None for the primary)."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+def primary():
+    """Read from the primary inside the block, e.g. before caching a result."""
+    return reading_from(None)
+
+class ReplicaRouter:
+    """
+    Writes, and reads outside ReplicaReadMixin views, go to the primary.
+    Without DATABASE_REPLICAS this routes everything to the primary.
+    """
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema from the primary through replication.
+        return db not in settings.DATABASE_REPLICAS
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests of a viewset from one replica, chosen per request.
+    Users pinned by pin_to_primary() keep reading from the primary.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        # Runs after authentication, so the pin check sees the real user.
+        super().initial(request, *args, **kwargs)
+        if settings.DATABASE_REPLICAS and request.method in ('GET', 'HEAD') and not is_pinned(request.user):
+            _read_alias.set(choose_replica())
@@ -0,0 +1,240 @@
+import difflib
+import re
+from django.db import connections, router, transaction, DatabaseError
+from .models import Restaurant, MenuItem, SearchDocument
+
+MAX_TERMS = 8
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+def parse_terms(query):
+    return [term.lower() for term in TERM_RE.findall(query or '')][:MAX_TERMS]
+
+def _menu_item_document(menu_item):
+    parts = [
+        menu_item.description,
+        menu_item.get_category_display(),
+        menu_item.sub_category,
+    ]
+    parts += [tag.name for tag in menu_item.tags.all()]
+    parts += [ingredient.name for ingredient in menu_item.ingredients.all()]
+    return menu_item.name, ' '.join(part for part in parts if part)
+
+def _restaurant_document(restaurant):
+    parts = [
+        restaurant.description,
+        restaurant.get_venue_type_display(),
+        restaurant.city,
+        restaurant.state,
+        restaurant.country,
+    ]
+    return restaurant.name, ' '.join(part for part in parts if part)
+
+def index_menu_item(menu_item_id):
+    menu_item = MenuItem.objects.prefetch_related('tags', 'ingredients').filter(pk=menu_item_id).first()
+    if menu_item is None:
+        remove('menu_item', menu_item_id)
+        return
+    title, body = _menu_item_document(menu_item)
+    SearchDocument.objects.update_or_create(
+        kind='menu_item', object_id=menu_item.pk,
+        defaults={'title': title, 'body': body},
+    )
+
+def index_restaurant(restaurant_id):
+    restaurant = Restaurant.objects.filter(pk=restaurant_id).first()
+    if restaurant is None:
+        remove('restaurant', restaurant_id)
+        return
+    title, body = _restaurant_document(restaurant)
+    SearchDocument.objects.update_or_create(
+        kind='restaurant', object_id=restaurant.pk,
+        defaults={'title': title, 'body': body},
+    )
+
+def remove(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+def rebuild():
+    SearchDocument.objects.all().delete()
+    documents = []
+    for restaurant in Restaurant.objects.iterator(chunk_size=500):
+        title, body = _restaurant_document(restaurant)
+        documents.append(SearchDocument(kind='restaurant', object_id=restaurant.pk, title=title, body=body))
+    menu_items = MenuItem.objects.prefetch_related('tags', 'ingredients')
+    for menu_item in menu_items.iterator(chunk_size=500):
+        title, body = _menu_item_document(menu_item)
+        documents.append(SearchDocument(kind='menu_item', object_id=menu_item.pk, title=title, body=body))
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+    return len(documents)
+
+class SearchBackend:
+    table = SearchDocument._meta.db_table
+
+    def install(self, connection):
+        pass
+
+    def search(self, connection, kind, terms, limit, among=None):
+        raise NotImplementedError
+
+    def _among(self, connection, among, column):
+        # Restrict matches to the caller's queryset inside the search query,
+        # so the limit only counts objects the caller will actually show.
+        if among is None:
+            return '', []
+        query = among.order_by().values('pk').query
+        sql, params = query.get_compiler(connection=connection).as_sql()
+        return f' AND {column} IN ({sql})', list(params)
+
+class LikeSearchBackend(SearchBackend):
+    # Portable fallback: still a scan, but over one narrow table instead of
+    # ORed LIKEs across every searchable column.
+    def search(self, connection, kind, terms, limit, among=None):
+        documents = SearchDocument.objects.using(connection.alias).filter(kind=kind)
+        if among is not None:
+            documents = documents.filter(object_id__in=among.using(connection.alias).order_by().values('pk'))
+        for term in terms:
+            documents = documents.filter(title__icontains=term) | documents.filter(body__icontains=term)
+        return list(documents.values_list('object_id', flat=True)[:limit])
+
+class SQLiteSearchBackend(SearchBackend):
+    fts_table = f'{SearchBackend.table}_fts'
+    vocab_table = f'{SearchBackend.table}_vocab'
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [self.fts_table]
+            )
+            if cursor.fetchone():
+                return
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {self.fts_table} USING fts5("
+                f"title, body, content='{self.table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.vocab_table} "
+                f"USING fts5vocab({self.fts_table}, 'row')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {self.fts_table}_ai AFTER INSERT ON {self.table} BEGIN "
+                f"INSERT INTO {self.fts_table}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {self.fts_table}_ad AFTER DELETE ON {self.table} BEGIN "
+                f"INSERT INTO {self.fts_table}({self.fts_table}, rowid, title, body) "
+                f"VALUES ('delete', old.id, old.title, old.body); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {self.fts_table}_au AFTER UPDATE ON {self.table} BEGIN "
+                f"INSERT INTO {self.fts_table}({self.fts_table}, rowid, title, body) "
+                f"VALUES ('delete', old.id, old.title, old.body); "
+                f"INSERT INTO {self.fts_table}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+            )
+            cursor.execute(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')")
+
+    def _similar_terms(self, cursor, term):
+        # Typo tolerance: borrow close spellings from the index vocabulary.
+        # The range scan on the first letter keeps the candidate set small.
+        cursor.execute(
+            f"SELECT term FROM {self.vocab_table} WHERE term >= %s AND term < %s",
+            [term[0], term[0] + '\uffff'],
+        )
+        vocabulary = [row[0] for row in cursor.fetchall()]
+        return difflib.get_close_matches(term, vocabulary, n=3, cutoff=0.75)
+
+    def search(self, connection, kind, terms, limit, among=None):
+        among_sql, among_params = self._among(connection, among, 'd.object_id')
+        with connection.cursor() as cursor:
+            clauses = []
+            for term in terms:
+                alternatives = [f'"{term}"*']
+                alternatives += [f'"{similar}"' for similar in self._similar_terms(cursor, term) if similar != term]
+                clauses.append('(' + ' OR '.join(alternatives) + ')')
+            cursor.execute(
+                f"SELECT d.object_id FROM {self.fts_table} "
+                f"JOIN {self.table} d ON d.id = {self.fts_table}.rowid "
+                f"WHERE {self.fts_table} MATCH %s AND d.kind = %s{among_sql} "
+                f"ORDER BY bm25({self.fts_table}, 10.0, 1.0) LIMIT %s",
+                [' AND '.join(clauses), kind, *among_params, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+class PostgresSearchBackend(SearchBackend):
+    vector = (
+        "(setweight(to_tsvector('simple', title), 'A') || "
+        "setweight(to_tsvector('simple', body), 'B'))"
+    )
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_vector "
+                f"ON {self.table} USING GIN ({self.vector})"
+            )
+        # pg_trgm is optional; without it search keeps prefix matching but
+        # loses typo tolerance.
+        try:
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.table}_title_trgm "
+                    f"ON {self.table} USING GIN (title gin_trgm_ops)"
+                )
+        except DatabaseError:
+            pass
+
+    def _has_trigram(self, cursor):
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+    def search(self, connection, kind, terms, limit, among=None):
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        phrase = ' '.join(terms)
+        among_sql, among_params = self._among(connection, among, 'object_id')
+        with connection.cursor() as cursor:
+            if self._has_trigram(cursor):
+                cursor.execute(
+                    f"SELECT object_id FROM {self.table}, to_tsquery('simple', %s) query "
+                    f"WHERE kind = %s AND ({self.vector} @@ query OR title %% %s){among_sql} "
+                    f"ORDER BY ts_rank({self.vector}, query) + similarity(title, %s) DESC LIMIT %s",
+                    [tsquery, kind, phrase, *among_params, phrase, limit],
+                )
+            else:
+                cursor.execute(
+                    f"SELECT object_id FROM {self.table}, to_tsquery('simple', %s) query "
+                    f"WHERE kind = %s AND {self.vector} @@ query{among_sql} "
+                    f"ORDER BY ts_rank({self.vector}, query) DESC LIMIT %s",
+                    [tsquery, kind, *among_params, limit],
+                )
+            return [row[0] for row in cursor.fetchall()]
+
+_fts5_support = {}
+
+def _sqlite_has_fts5(connection):
+    if connection.alias not in _fts5_support:
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            _fts5_support[connection.alias] = any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+    return _fts5_support[connection.alias]
+
+def get_backend(connection):
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite' and _sqlite_has_fts5(connection):
+        return SQLiteSearchBackend()
+    return LikeSearchBackend()
+
+def install(connection):
+    get_backend(connection).install(connection)
+
+def search(kind, query, among=None, limit=500):
+    """
+    Ids of the best `limit` matches for query, best first, drawn only from
+    the `among` queryset when one is given.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return []
+    connection = connections[router.db_for_read(SearchDocument)]
+    return get_backend(connection).search(connection, kind, terms, limit, among)
@@ -1,89 +1,248 @@
+from decimal import Decimal
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
 from .models import (
-    Restaurant, Table, Stall, MenuItem, MenuItemTag, MenuItemIngredient,
+    Restaurant, RestaurantHours, Table, Stall, MenuItem, MenuItemTag, MenuItemIngredient,
     Review, Order, OrderItem, Wallet, WalletTransaction, Notification
 )
+from . import images, instrumentation, kitchen, ledger
 
-class UserSerializer(serializers.ModelSerializer):
+def _split_paths(value):
+    return {path.strip() for path in (value or '').split(',') if path.strip()}
+
+class FieldSelection:
+    """
+    The `?fields=` / `?expand=` choices of one request. Paths are dotted
+    from the top-level serializer, e.g. `fields=id,items.quantity` or
+    `expand=items.menu_item`.
+    """
+    def __init__(self, fields=(), expand=()):
+        self.fields = set(fields)
+        self.expand = set(expand)
+
+    @classmethod
+    def from_context(cls, context):
+        request = context.get('request')
+        params = request.query_params if request is not None else {}
+        if 'expand' in params:
+            expand = _split_paths(params['expand'])
+        else:
+            expand = context.get('default_expand', ())
+        # Writes need every input field, so trimming only applies to reads.
+        trim = request is not None and request.method in ('GET', 'HEAD')
+        return cls(_split_paths(params.get('fields')) if trim else (), expand)
+
+    def _selected_under(self, parent):
+        prefix = f'{parent}.' if parent else ''
+        return {path[len(prefix):].split('.')[0] for path in self.fields if path.startswith(prefix)}
+
+    def includes(self, path):
+        parts = path.split('.')
+        for depth in range(len(parts)):
+            selected = self._selected_under('.'.join(parts[:depth]))
+            if selected and parts[depth] not in selected:
+                return False
+        return True
+
+    def expands(self, path):
+        return path in self.expand or any(
+            selected == path or selected.startswith(f'{path}.') for selected in self.fields
+        )
+
+    def wants(self, path):
+        return self.includes(path) and self.expands(path)
+
+def field_selection(context):
+    if '_field_selection' not in context:
+        context['_field_selection'] = FieldSelection.from_context(context)
+    return context['_field_selection']
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets for ModelSerializers. Relations listed in
+    `expandable_fields` as `name: (serializer_class, kwargs)` replace the
+    declared field (or are left out) unless the request expands them.
+    """
+    expandable_fields = {}
+
+    def _path(self):
+        parts = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                parts.insert(0, node.field_name)
+            node = node.parent
+        return '.'.join(parts)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = field_selection(self.context)
+        prefix = self._path()
+        prefix = f'{prefix}.' if prefix else ''
+        for name, (serializer_class, kwargs) in self.expandable_fields.items():
+            if selection.expands(prefix + name):
+                fields[name] = serializer_class(**kwargs)
+        return {
+            name: field for name, field in fields.items()
+            if selection.includes(prefix + name)
+        }
+
+    def to_representation(self, instance):
+        # Only the outermost serializer is timed so nesting is not double counted.
+        if self.root not in (self, self.parent):
+            return super().to_representation(instance)
+        with instrumentation.serializing():
+            return super().to_representation(instance)
+
+class SrcsetField(serializers.Field):
+    """
+    `{'webp': 'url 160w, url 320w, ...', 'jpeg': ...}` for an image field,
+    ready for <img srcset>/<source srcset>; null until derivatives exist.
+    """
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        request = self.context.get('request')
+        build_url = request.build_absolute_uri if request is not None else str
+        return images.srcset(getattr(instance, images.variants_field(self.image_field)), image.name, build_url)
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name')
 
-class MenuItemTagSerializer(serializers.ModelSerializer):
+class MenuItemTagSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MenuItemTag
         fields = ('name',)
 
-class MenuItemIngredientSerializer(serializers.ModelSerializer):
+class MenuItemIngredientSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MenuItemIngredient
         fields = ('name',)
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
         model = Review
         fields = ('id', 'user', 'rating', 'comment', 'created_at')
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     tags = MenuItemTagSerializer(many=True, read_only=True)
     ingredients = MenuItemIngredientSerializer(many=True, read_only=True)
-    reviews = ReviewSerializer(many=True, read_only=True)
-    rating = serializers.SerializerMethodField()
-    rating_count = serializers.SerializerMethodField()
+    rating = serializers.FloatField(read_only=True)
+    rating_count = serializers.IntegerField(source='review_count', read_only=True)
+    image_srcset = SrcsetField('image')
 
     class Meta:
         model = MenuItem
         fields = (
             'id', 'name', 'description', 'price', 'category', 'sub_category',
-            'image', 'available', 'preparation_time', 'featured', 'calories',
-            'protein', 'carbs', 'fat', 'tags', 'ingredients', 'reviews',
-            'rating', 'rating_count'
+            'image', 'image_srcset', 'available', 'preparation_time', 'featured', 'calories',
+            'protein', 'carbs', 'fat', 'tags', 'ingredients', 'rating',
+            'rating_count'
         )
 
-    def get_rating(self, obj):
-        reviews = obj.reviews.all()
-        if not reviews:
-            return None
-        return sum(review.rating for review in reviews) / len(reviews)
-
-    def get_rating_count(self, obj):
-        return obj.reviews.count()
-
-class StallSerializer(serializers.ModelSerializer):
+class StallSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     menu = MenuItemSerializer(source='menu_items', many=True, read_only=True)
+    logo_srcset = SrcsetField('logo')
 
     class Meta:
         model = Stall
-        fields = ('id', 'name', 'description', 'logo', 'cuisine', 'menu')
+        fields = ('id', 'name', 'description', 'logo', 'logo_srcset', 'cuisine', 'menu')
+
+class TableSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    is_locked = serializers.BooleanField(source='lock_active', read_only=True)
 
-class TableSerializer(serializers.ModelSerializer):
     class Meta:
         model = Table
-        fields = ('id', 'number', 'seats', 'qr_code', 'type', 'is_available', 'is_locked')
+        fields = (
+            'id', 'number', 'seats', 'qr_code', 'type', 'is_available',
+            'is_locked', 'locked_until'
+        )
 
-class RestaurantSerializer(serializers.ModelSerializer):
-    tables = TableSerializer(many=True, read_only=True)
-    menu = MenuItemSerializer(source='menu_items', many=True, read_only=True)
-    stalls = StallSerializer(many=True, read_only=True)
+class TableSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Table
+        fields = ('id', 'number', 'seats', 'qr_code', 'type', 'is_available')
+
+class RestaurantHoursSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = RestaurantHours
+        fields = ('day', 'open_time', 'close_time')
+
+class RestaurantSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'tables': (TableSerializer, {'many': True, 'read_only': True}),
+        'menu': (MenuItemSerializer, {'source': 'menu_items', 'many': True, 'read_only': True}),
+        'stalls': (StallSerializer, {'many': True, 'read_only': True}),
+        'hours': (RestaurantHoursSerializer, {'many': True, 'read_only': True}),
+    }
+    logo_srcset = SrcsetField('logo')
 
     class Meta:
         model = Restaurant
         fields = (
-            'id', 'name', 'description', 'logo', 'venue_type', 'country',
+            'id', 'name', 'description', 'logo', 'logo_srcset', 'venue_type', 'country',
             'state', 'city', 'address', 'latitude', 'longitude',
-            'opening_time', 'closing_time', 'tables', 'menu', 'stalls'
+            'opening_time', 'closing_time', 'timezone'
+        )
+
+class RestaurantSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    logo_srcset = SrcsetField('logo')
+
+    class Meta:
+        model = Restaurant
+        fields = (
+            'id', 'name', 'description', 'logo', 'logo_srcset', 'venue_type', 'city',
+            'address', 'latitude', 'longitude', 'opening_time', 'closing_time',
+            'timezone'
         )
 
-class OrderItemSerializer(serializers.ModelSerializer):
-    menu_item = MenuItemSerializer(read_only=True)
-    menu_item_id = serializers.PrimaryKeyRelatedField(
-        queryset=MenuItem.objects.all(), 
-        write_only=True,
-        source='menu_item'
-    )
+class NearbyRestaurantSerializer(RestaurantSummarySerializer):
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta(RestaurantSummarySerializer.Meta):
+        fields = RestaurantSummarySerializer.Meta.fields + ('distance',)
+
+class NearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(min_value=0.1, max_value=50, default=5)
+
+class MenuItemSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    image_srcset = SrcsetField('image')
+
+    class Meta:
+        model = MenuItem
+        fields = ('id', 'name', 'price', 'image', 'image_srcset')
+
+class OpenHoursQuerySerializer(serializers.Serializer):
+    open_now = serializers.BooleanField(required=False)
+    open_at = serializers.DateTimeField(required=False)
+
+class OrderItemListSerializer(serializers.ListSerializer):
+    def get_attribute(self, instance):
+        # An order OrderSerializer.create just wrote renders the lines it
+        # inserted rather than reading them back.
+        lines = getattr(self.parent, '_created_lines', {}).get(instance.pk)
+        return lines if lines is not None else super().get_attribute(instance)
+
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    menu_item = MenuItemSummarySerializer(read_only=True)
+    expandable_fields = {
+        'menu_item': (MenuItemSerializer, {'read_only': True}),
+    }
+    # Plain ids on the way in; OrderSerializer.validate resolves every line
+    # in one query instead of a lookup per related field.
+    menu_item_id = serializers.IntegerField(write_only=True)
+    stall = serializers.IntegerField(source='stall_id', required=False, allow_null=True)
 
     class Meta:
         model = OrderItem
@@ -91,56 +250,159 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'id', 'menu_item', 'menu_item_id', 'stall', 'quantity',
             'price', 'special_instructions'
         )
+        read_only_fields = ('price',)
+        extra_kwargs = {'quantity': {'min_value': 1}}
+        list_serializer_class = OrderItemListSerializer
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
     user = UserSerializer(read_only=True)
+    pay_with_wallet = serializers.BooleanField(write_only=True, required=False, default=False)
 
     class Meta:
         model = Order
         fields = (
             'id', 'user', 'restaurant', 'table', 'status', 'total_amount',
-            'estimated_delivery_time', 'items', 'created_at', 'updated_at'
+            'estimated_delivery_time', 'items', 'pay_with_wallet',
+            'created_at', 'updated_at'
         )
         read_only_fields = ('user', 'total_amount', 'status')
 
+    def validate(self, attrs):
+        restaurant = attrs.get('restaurant')
+        table = attrs.get('table')
+        items = attrs.get('items')
+        if self.instance is None and not items:
+            raise serializers.ValidationError({'items': 'An order needs at least one item.'})
+        if restaurant and table and table.restaurant_id != restaurant.pk:
+            raise serializers.ValidationError({'table': 'Table does not belong to this restaurant.'})
+        if items is None:
+            return attrs
+
+        # Full menu items only when the response will expand them.
+        menu_items = MenuItem.objects.all()
+        if field_selection(self.context).expands('items.menu_item'):
+            menu_items = menu_items.for_serializer()
+        menu_items = menu_items.in_bulk(
+            {item['menu_item_id'] for item in items}
+        )
+        errors = []
+        for item in items:
+            menu_item = menu_items.get(item['menu_item_id'])
+            error = {}
+            if menu_item is None:
+                error['menu_item_id'] = 'Menu item does not exist.'
+            elif not menu_item.available:
+                error['menu_item_id'] = 'Menu item is not available.'
+            elif restaurant and menu_item.restaurant_id != restaurant.pk:
+                error['menu_item_id'] = 'Menu item does not belong to this restaurant.'
+            elif item.get('stall_id') is None:
+                item['stall_id'] = menu_item.stall_id
+            elif item['stall_id'] != menu_item.stall_id:
+                error['stall'] = 'Menu item is not served by this stall.'
+            item['menu_item'] = menu_item
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError({'items': errors})
+        return attrs
+
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        
-        total_amount = 0
+        pay_with_wallet = validated_data.pop('pay_with_wallet', False)
+
+        lines = []
+        total_amount = Decimal('0')
         for item_data in items_data:
             menu_item = item_data['menu_item']
             quantity = item_data['quantity']
             price = menu_item.price * quantity
             total_amount += price
-            
-            OrderItem.objects.create(
-                order=order,
+            lines.append(OrderItem(
                 menu_item=menu_item,
-                stall=item_data.get('stall'),
+                stall_id=item_data['stall_id'],
                 quantity=quantity,
                 price=price,
                 special_instructions=item_data.get('special_instructions', '')
-            )
-        
-        order.total_amount = total_amount
-        order.save()
+            ))
+
+        order = Order.objects.create(total_amount=total_amount, **validated_data)
+        for line in lines:
+            line.order = order
+            line.restaurant_id = order.restaurant_id
+        OrderItem.objects.bulk_create(lines)
+
+        if pay_with_wallet:
+            wallet_id = Wallet.objects.filter(user=order.user).values_list('id', flat=True).first()
+            if wallet_id is None:
+                raise serializers.ValidationError({'pay_with_wallet': 'No wallet found for this user.'})
+            try:
+                ledger.debit(
+                    wallet_id, total_amount, f'Payment for order #{order.pk}',
+                    reference_id=ledger.order_reference(order.pk),
+                )
+            except ledger.InsufficientFunds:
+                raise serializers.ValidationError({'pay_with_wallet': 'Insufficient wallet balance.'})
+
+        self._created_lines = {order.pk: lines}
         return order
 
-class WalletTransactionSerializer(serializers.ModelSerializer):
+class KitchenOrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    order = serializers.IntegerField(source='order_id', read_only=True)
+    table = serializers.IntegerField(source='order.table.number', read_only=True)
+    menu_item = serializers.CharField(source='menu_item.name', read_only=True)
+    stall = serializers.IntegerField(source='stall_id', read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = (
+            'id', 'order', 'table', 'menu_item', 'stall', 'quantity',
+            'special_instructions', 'status', 'created_at', 'updated_at'
+        )
+
+class KitchenQuerySerializer(serializers.Serializer):
+    stall = serializers.IntegerField(required=False)
+    restaurant = serializers.IntegerField(required=False)
+    since = serializers.CharField(required=False)
+
+    def validate_since(self, value):
+        try:
+            return kitchen.decode_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError('Invalid cursor.')
+
+    def validate(self, attrs):
+        if ('stall' in attrs) == ('restaurant' in attrs):
+            raise serializers.ValidationError('Pass exactly one of stall or restaurant.')
+        return attrs
+
+class KitchenTransitionSerializer(serializers.Serializer):
+    items = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=200)
+    status = serializers.ChoiceField(choices=sorted(kitchen.TRANSITIONS))
+
+class WalletTransactionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = WalletTransaction
         fields = ('id', 'type', 'amount', 'description', 'created_at')
 
-class WalletSerializer(serializers.ModelSerializer):
-    transactions = WalletTransactionSerializer(many=True, read_only=True)
+class WalletSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Filled by WalletViewSet with the newest few entries; the full history
+    # is paginated under /wallet/{id}/transactions/.
+    recent_transactions = WalletTransactionSerializer(many=True, read_only=True)
 
     class Meta:
         model = Wallet
-        fields = ('id', 'balance', 'currency', 'transactions')
+        fields = ('id', 'balance', 'currency', 'recent_transactions')
+
+class WalletTransactionQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    type = serializers.ChoiceField(choices=WalletTransaction.TRANSACTION_TYPES, required=False)
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ('id', 'type', 'message', 'read', 'created_at')
\ No newline at end of file
+        fields = ('id', 'type', 'message', 'read', 'created_at')
+
+class NotificationIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
\ No newline at end of file
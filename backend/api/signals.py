@@ -0,0 +1,154 @@
+from django.db import connections, transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import (
+    Restaurant, RestaurantHours, Table, Stall, MenuItem, MenuItemTag, MenuItemIngredient, Review, Order,
+    Notification, SearchDocument
+)
+from .serializers import NotificationSerializer
+from . import conditional, events, hours, images, notifications, resolver, search, snapshots, tasks
+
+def _invalidate_menu(restaurant_id):
+    if restaurant_id is not None:
+        transaction.on_commit(lambda: snapshots.invalidate(restaurant_id))
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def restaurant_changed(sender, instance, **kwargs):
+    restaurant_id = instance.pk
+    _invalidate_menu(restaurant_id)
+    transaction.on_commit(lambda: resolver.invalidate_restaurant(restaurant_id))
+
+def _rebuild_hours(restaurant_id):
+    # After commit, so a cascade delete of the restaurant is already gone
+    # and leaves no intervals behind.
+    def rebuild():
+        hours.rebuild([restaurant_id])
+        resolver.invalidate_restaurant(restaurant_id)
+    transaction.on_commit(rebuild)
+
+@receiver(post_save, sender=Restaurant)
+def restaurant_hours_source_changed(sender, instance, **kwargs):
+    # Cheap enough to redo on every save; covers timezone and fallback hours.
+    _rebuild_hours(instance.pk)
+
+@receiver([post_save, post_delete], sender=RestaurantHours)
+def restaurant_hours_changed(sender, instance, **kwargs):
+    _rebuild_hours(instance.restaurant_id)
+
+@receiver([post_save, post_delete], sender=Table)
+def table_changed(sender, instance, **kwargs):
+    table_id = instance.pk
+    transaction.on_commit(lambda: resolver.invalidate_table(table_id))
+
+@receiver([post_save, post_delete], sender=Stall)
+@receiver([post_save, post_delete], sender=MenuItem)
+def menu_changed(sender, instance, **kwargs):
+    _invalidate_menu(instance.restaurant_id)
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_save, sender=Stall)
+@receiver(post_save, sender=MenuItem)
+def image_uploaded(sender, instance, **kwargs):
+    model_label = instance._meta.label_lower
+    for field_name in images.IMAGE_FIELDS[model_label]:
+        if images.needs_variants(instance, field_name):
+            pk = instance.pk
+            transaction.on_commit(
+                lambda field_name=field_name: tasks.generate_image_variants.delay(model_label, pk, field_name)
+            )
+
+@receiver([post_save, post_delete], sender=MenuItemTag)
+@receiver([post_save, post_delete], sender=MenuItemIngredient)
+@receiver([post_save, post_delete], sender=Review)
+def menu_item_detail_changed(sender, instance, **kwargs):
+    restaurant_id = (
+        MenuItem.objects.filter(pk=instance.menu_item_id)
+        .values_list('restaurant_id', flat=True)
+        .first()
+    )
+    _invalidate_menu(restaurant_id)
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk is not None:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list('menu_item_id', 'rating').first()
+        )
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        MenuItem.objects.filter(pk=instance.menu_item_id).adjust_rating(1, instance.rating)
+        return
+    previous_item_id, previous_rating = previous
+    if previous_item_id == instance.menu_item_id:
+        if previous_rating != instance.rating:
+            MenuItem.objects.filter(pk=instance.menu_item_id).adjust_rating(
+                0, instance.rating - previous_rating
+            )
+    else:
+        MenuItem.objects.filter(pk=previous_item_id).adjust_rating(-1, -previous_rating)
+        MenuItem.objects.filter(pk=instance.menu_item_id).adjust_rating(1, instance.rating)
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    MenuItem.objects.filter(pk=instance.menu_item_id).adjust_rating(-1, -instance.rating)
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def reindex_restaurant(sender, instance, **kwargs):
+    restaurant_id = instance.pk
+    transaction.on_commit(lambda: search.index_restaurant(restaurant_id))
+
+@receiver([post_save, post_delete], sender=MenuItem)
+def reindex_menu_item(sender, instance, **kwargs):
+    menu_item_id = instance.pk
+    transaction.on_commit(lambda: search.index_menu_item(menu_item_id))
+
+@receiver([post_save, post_delete], sender=MenuItemTag)
+@receiver([post_save, post_delete], sender=MenuItemIngredient)
+def reindex_menu_item_terms(sender, instance, **kwargs):
+    menu_item_id = instance.menu_item_id
+    transaction.on_commit(lambda: search.index_menu_item(menu_item_id))
+
+# Registered after the rebuilds above so its on_commit runs last; a
+# request must not pair the new version with the old search documents.
+@receiver([post_save, post_delete], sender=Restaurant)
+@receiver([post_save, post_delete], sender=RestaurantHours)
+@receiver([post_save, post_delete], sender=Stall)
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=MenuItemTag)
+@receiver([post_save, post_delete], sender=MenuItemIngredient)
+@receiver([post_save, post_delete], sender=Review)
+def catalogue_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: conditional.bump_version(conditional.CATALOGUE))
+
+@receiver([post_save, post_delete], sender=Table)
+def tables_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: conditional.bump_version(conditional.TABLES))
+
+def install_search_backend(sender, using, **kwargs):
+    connection = connections[using]
+    # Skip until the migration that creates the document table has run.
+    if SearchDocument._meta.db_table in connection.introspection.table_names():
+        search.install(connection)
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, created, **kwargs):
+    if not created and instance.status == getattr(instance, '_loaded_status', None):
+        return
+    instance._loaded_status = instance.status
+    user_id = instance.user_id
+    data = events.order_status_data(
+        instance.pk, instance.restaurant_id, instance.status, instance.updated_at
+    )
+    transaction.on_commit(lambda: events.publish(user_id, 'order.status', data))
+
+@receiver(post_save, sender=Notification)
+def notification_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    user_id, data = instance.user_id, NotificationSerializer(instance).data
+    transaction.on_commit(lambda: notifications.adjust_unread(user_id, 1))
+    transaction.on_commit(lambda: events.publish(user_id, 'notification', data))
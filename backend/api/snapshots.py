@@ -0,0 +1,86 @@
+import time
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from .models import Restaurant, Stall, MenuItem
+from .serializers import MenuItemSerializer, StallSerializer
+from . import routing
+
+# Bump when the snapshot payload changes shape so stale blobs are ignored.
+SNAPSHOT_SCHEMA = 3
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+def _version_key(restaurant_id):
+    return f'menu-snapshot:{restaurant_id}:version'
+
+def _snapshot_key(restaurant_id, version):
+    return f'menu-snapshot:{restaurant_id}:s{SNAPSHOT_SCHEMA}:v{version}'
+
+def _seed_version():
+    # The version key can be evicted while snapshot blobs for old versions
+    # live on; restarting at 1 would serve those again. A clock-based seed
+    # is always past any version handed out before. Microseconds keep it
+    # within the integers JavaScript clients can represent exactly.
+    return time.time_ns() // 1000
+
+def get_version(restaurant_id):
+    version = cache.get(_version_key(restaurant_id))
+    if version is None:
+        seed = _seed_version()
+        cache.add(_version_key(restaurant_id), seed, timeout=None)
+        version = cache.get(_version_key(restaurant_id), seed)
+    return version
+
+def invalidate(restaurant_id):
+    try:
+        cache.incr(_version_key(restaurant_id))
+    except ValueError:
+        cache.add(_version_key(restaurant_id), _seed_version(), timeout=None)
+
+def build(restaurant, version):
+    available_items = MenuItem.objects.filter(available=True).for_serializer()
+    menu_items = available_items.filter(restaurant=restaurant)
+    stalls = Stall.objects.filter(restaurant=restaurant, is_active=True).prefetch_related(
+        Prefetch('menu_items', queryset=available_items)
+    )
+    data = {
+        'restaurant': restaurant.pk,
+        'version': version,
+        'menu': MenuItemSerializer(menu_items, many=True).data,
+        'stalls': StallSerializer(stalls, many=True).data,
+    }
+    return JSONRenderer().render(data)
+
+def _build_from_primary(restaurant_id, version):
+    # A lagging replica would pin stale rows under the new version.
+    with routing.primary():
+        restaurant = Restaurant.objects.get(pk=restaurant_id, is_active=True)
+        return build(restaurant, version)
+
+def get_menu_snapshot(restaurant_id):
+    version = get_version(restaurant_id)
+    key = _snapshot_key(restaurant_id, version)
+    blob = cache.get(key)
+    if blob is None:
+        blob = _build_from_primary(restaurant_id, version)
+        cache.set(key, blob, timeout=SNAPSHOT_TIMEOUT)
+    return blob
+
+async def aget_version(restaurant_id):
+    version = await cache.aget(_version_key(restaurant_id))
+    if version is None:
+        seed = _seed_version()
+        await cache.aadd(_version_key(restaurant_id), seed, timeout=None)
+        version = await cache.aget(_version_key(restaurant_id), seed)
+    return version
+
+async def aget_menu_snapshot(restaurant_id):
+    """get_menu_snapshot() on async cache calls; only a miss uses a thread."""
+    version = await aget_version(restaurant_id)
+    key = _snapshot_key(restaurant_id, version)
+    blob = await cache.aget(key)
+    if blob is None:
+        blob = await sync_to_async(_build_from_primary)(restaurant_id, version)
+        await cache.aset(key, blob, timeout=SNAPSHOT_TIMEOUT)
+    return blob
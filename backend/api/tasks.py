@@ -0,0 +1,18 @@
+from celery import shared_task
+from . import conditional, images, notifications, resolver, snapshots
+
+@shared_task
+def notify_users(user_ids, type, message):
+    return notifications.create_notifications(user_ids, type, message)
+
+@shared_task
+def generate_image_variants(model_label, pk, field_name):
+    instance = images.generate(model_label, pk, field_name)
+    if instance is None:
+        return False
+    # The variants were written with update(), so no signal announces them.
+    restaurant_id = getattr(instance, 'restaurant_id', instance.pk)
+    snapshots.invalidate(restaurant_id)
+    resolver.invalidate_restaurant(restaurant_id)
+    conditional.bump_version(conditional.CATALOGUE)
+    return True
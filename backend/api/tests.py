@@ -0,0 +1,665 @@
+import time as time_module
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
+from decimal import Decimal
+from unittest import skipUnless
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+from django.core.cache import cache
+from api import hours, instrumentation, kitchen, ledger, notifications, routing, search, snapshots
+from api.management.commands.benchmark import FULL_SCAN_PATTERNS
+from api.models import Restaurant, RestaurantHours, Stall, Table, MenuItem, MenuItemTag, MenuItemIngredient, Order, OrderItem, Wallet, Notification
+from api.views import (
+    RestaurantViewSet, TableViewSet, MenuItemViewSet, OrderViewSet, WalletViewSet, NotificationViewSet
+)
+
+def make_catalogue(restaurants=2, items=4):
+    created = []
+    for r in range(restaurants):
+        restaurant = Restaurant.objects.create(
+            name=f'Restaurant {r}', description='Wood-fired pizza', venue_type='restaurant',
+            city='Pune', address='Main road', latitude=Decimal('18.52'), longitude=Decimal('73.85'),
+            opening_time=time(0), closing_time=time(23, 59),
+        )
+        stall = Stall.objects.create(restaurant=restaurant, name=f'Stall {r}', cuisine='Indian')
+        for t in range(3):
+            Table.objects.create(restaurant=restaurant, number=t + 1, seats=4, qr_code=f'qr-{restaurant.pk}-{t}', type='private')
+        for i in range(items):
+            menu_item = MenuItem.objects.create(
+                restaurant=restaurant, stall=stall if i % 2 else None, name=f'Margherita {r}-{i}',
+                description='Cheese, tomato and basil', price=Decimal('9.50'), category='Veg',
+                sub_category='Pizza', preparation_time=10,
+            )
+            MenuItemTag.objects.create(menu_item=menu_item, name='spicy')
+            MenuItemIngredient.objects.create(menu_item=menu_item, name='mozzarella')
+        created.append(restaurant)
+    return created
+
+def make_customer(username='alice', **extra):
+    return User.objects.create_user(username, f'{username}@example.com', 'password', **extra)
+
+def place_order(client, restaurant, lines=2, **extra):
+    menu_items = list(restaurant.menu_items.order_by('pk')[:lines])
+    response = client.post('/api/orders/', {
+        'restaurant': restaurant.pk,
+        'table': restaurant.tables.first().pk,
+        'items': [{'menu_item_id': item.pk, 'quantity': 1} for item in menu_items],
+        **extra,
+    }, format='json')
+    assert response.status_code == 201, response.content
+    return response.json()['id']
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_catalogue(restaurants=1)[0]
+
+    def test_if_modified_since_is_answered_from_the_etag(self):
+        since = http_date(timezone.now().timestamp() + 3600)
+        for url in (
+            '/api/restaurants/', f'/api/restaurants/{self.restaurant.pk}/', '/api/tables/',
+            '/api/menu-items/', '/api/async/restaurants/',
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, headers={'If-Modified-Since': since})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Last-Modified', response)
+                self.assertIn('ETag', response)
+
+    def test_item_leaving_the_set_changes_the_etag(self):
+        etag = self.client.get('/api/menu-items/')['ETag']
+        menu_item = self.restaurant.menu_items.first()
+        menu_item.available = False
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.save()
+        response = self.client.get('/api/menu-items/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_expanded_relation_changes_the_list_etag(self):
+        url = '/api/restaurants/?expand=menu'
+        etag = self.client.get(url)['ETag']
+        tag = MenuItemTag.objects.filter(menu_item__restaurant=self.restaurant).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_unchanged_collection_is_not_modified(self):
+        # Only the live table leases a detail renders are counted.
+        for url, queries in (
+            ('/api/restaurants/', 0), (f'/api/restaurants/{self.restaurant.pk}/', 1), ('/api/menu-items/', 0),
+        ):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 304)
+
+    def test_table_lock_and_lapse_change_the_etag(self):
+        table = self.restaurant.tables.first()
+        url = f'/api/restaurants/{self.restaurant.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.post(f'/api/tables/{table.pk}/lock/').status_code, 200)
+        locked = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(locked.status_code, 200)
+        Table.objects.filter(pk=table.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        response = self.client.get(url, headers={'If-None-Match': locked['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+class OrderCancelTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_catalogue(restaurants=1)[0]
+        self.customer = make_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.kitchen = APIClient()
+        self.kitchen.force_authenticate(make_customer('chef', is_staff=True))
+
+    def test_cancel_takes_lines_off_the_kitchen_queue(self):
+        order_id = place_order(self.client, self.restaurant, lines=3)
+        response = self.client.post(f'/api/orders/{order_id}/cancel/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'cancelled')
+        self.assertEqual(set(OrderItem.objects.filter(order_id=order_id).values_list('status', flat=True)), {'cancelled'})
+        queue = self.kitchen.get('/api/kitchen/', {'restaurant': self.restaurant.pk}).json()['items']
+        self.assertEqual(queue, [])
+
+    def test_only_pending_orders_can_be_cancelled(self):
+        order_id = place_order(self.client, self.restaurant)
+        Order.objects.filter(pk=order_id).update(status='preparing')
+        response = self.client.post(f'/api/orders/{order_id}/cancel/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cancel_refunds_a_wallet_payment_once(self):
+        wallet = Wallet.objects.create(user=self.customer)
+        ledger.credit(wallet.pk, Decimal('100.00'), 'Top up')
+        order_id = place_order(self.client, self.restaurant, pay_with_wallet=True)
+        total = Order.objects.get(pk=order_id).total_amount
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal('100.00') - total)
+        created, expected, actual = ledger.checkpoint(wallet.pk)
+        self.assertIsNotNone(created)
+
+        self.assertEqual(self.client.post(f'/api/orders/{order_id}/cancel/').status_code, 200)
+        self.assertEqual(self.client.post(f'/api/orders/{order_id}/cancel/').status_code, 400)
+        self.assertIsNone(ledger.refund_order(order_id))
+
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal('100.00'))
+        refund = wallet.transactions.get(type='credit', reference_id=ledger.order_reference(order_id))
+        self.assertEqual(refund.amount, total)
+        self.assertEqual(ledger.reconcile(wallet), (Decimal('100.00'), Decimal('100.00')))
+        created, expected, actual = ledger.checkpoint(wallet.pk)
+        self.assertIsNotNone(created)
+        self.assertEqual(created.balance, Decimal('100.00'))
+
+class TableLockTests(TestCase):
+    def setUp(self):
+        self.table = make_catalogue(restaurants=1)[0].tables.first()
+        self.url = f'/api/tables/{self.table.pk}/'
+        self.client = APIClient()
+        self.rival = APIClient()
+
+    def lock(self, client):
+        return client.post(self.url + 'lock/')
+
+    def test_competing_lock_is_refused_until_released(self):
+        response = self.lock(self.client)
+        self.assertEqual(response.status_code, 200)
+        token = response.json()['lock_token']
+        self.assertEqual(self.lock(self.rival).status_code, 400)
+        self.assertTrue(self.client.get(self.url).json()['is_locked'])
+        self.assertEqual(self.client.post(self.url + 'unlock/', {'lock_token': token}).status_code, 200)
+        self.assertEqual(self.lock(self.rival).status_code, 200)
+
+    def test_wrong_token_is_forbidden(self):
+        token = self.lock(self.client).json()['lock_token']
+        wrong = str(uuid.uuid4())
+        self.assertEqual(self.rival.post(self.url + 'renew/', {'lock_token': wrong}).status_code, 403)
+        self.assertEqual(self.rival.post(self.url + 'unlock/', {'lock_token': wrong}).status_code, 403)
+        self.assertEqual(self.rival.post(self.url + 'unlock/').status_code, 403)
+        self.assertEqual(self.client.post(self.url + 'renew/', {'lock_token': token}).status_code, 200)
+        self.assertEqual(self.client.post(self.url + 'unlock/', {'lock_token': token}).status_code, 200)
+        self.assertEqual(self.client.post(self.url + 'unlock/', {'lock_token': token}).status_code, 400)
+
+    def test_lapsed_lease_can_be_taken_over_and_swept(self):
+        self.lock(self.client)
+        Table.objects.filter(pk=self.table.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(self.client.get(self.url).json()['is_locked'])
+        self.assertEqual(self.rival.post(self.url + 'unlock/').status_code, 400)
+        self.assertEqual(self.lock(self.rival).status_code, 200)
+        Table.objects.filter(pk=self.table.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(Table.objects.release_expired_locks(), 1)
+        self.assertFalse(Table.objects.get(pk=self.table.pk).is_locked)
+
+    def test_lock_without_a_lease_counts_as_lapsed(self):
+        # Rows locked before leases were added.
+        Table.objects.filter(pk=self.table.pk).update(is_locked=True, locked_until=None)
+        self.assertEqual(Table.objects.release_expired_locks(), 1)
+        Table.objects.filter(pk=self.table.pk).update(is_locked=True, locked_until=None)
+        self.assertEqual(self.lock(self.rival).status_code, 200)
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = make_customer()
+        self.wallet = Wallet.objects.create(user=self.customer)
+        self.url = f'/api/wallet/{self.wallet.pk}/add_money/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def add_money(self, amount='10.00', key='top-up-1'):
+        return self.client.post(self.url, {'amount': amount}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def balance(self):
+        self.wallet.refresh_from_db()
+        return self.wallet.balance
+
+    def test_retry_replays_the_first_response(self):
+        first = self.add_money()
+        retry = self.add_money()
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.balance(), Decimal('10.00'))
+
+    def test_duplicate_while_the_first_is_in_flight_is_not_applied(self):
+        credit, duplicates = ledger.credit, []
+        def credit_with_duplicate(*args, **kwargs):
+            duplicates.append(self.add_money())
+            return credit(*args, **kwargs)
+        with mock.patch('api.idempotency.LOCK_WAIT', 0.1), \
+                mock.patch('api.ledger.credit', side_effect=credit_with_duplicate):
+            first = self.add_money()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([response.status_code for response in duplicates], [409])
+        self.assertEqual(self.add_money()['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.balance(), Decimal('10.00'))
+
+    def test_key_reused_with_a_different_body_is_rejected(self):
+        self.add_money('10.00')
+        response = self.add_money('25.00')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.balance(), Decimal('10.00'))
+
+    @override_settings(IDEMPOTENCY_KEY_TTL=60)
+    def test_key_expires_after_the_ttl(self):
+        self.add_money()
+        with mock.patch('django.core.cache.backends.locmem.time') as clock:
+            clock.time.return_value = time_module.time() + 61
+            response = self.add_money()
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(self.balance(), Decimal('20.00'))
+
+class MenuItemSaveTests(TestCase):
+    def setUp(self):
+        self.menu_item = make_catalogue(restaurants=1, items=1)[0].menu_items.get()
+
+    def test_save_leaves_the_rating_counters_alone(self):
+        stale = MenuItem.objects.get(pk=self.menu_item.pk)
+        MenuItem.objects.filter(pk=stale.pk).adjust_rating(1, 5)
+        stale.price = Decimal('11.00')
+        stale.save()
+        saved = MenuItem.objects.get(pk=stale.pk)
+        self.assertEqual((saved.price, saved.review_count, saved.rating_sum), (Decimal('11.00'), 1, 5))
+
+    def test_save_does_not_load_deferred_fields(self):
+        menu_item = MenuItem.objects.only('id', 'name').get(pk=self.menu_item.pk)
+        menu_item.name = 'Marinara'
+        with CaptureQueriesContext(connection) as queries:
+            menu_item.save()
+        statements = [query['sql'] for query in queries]
+        self.assertEqual(len([sql for sql in statements if sql.startswith('UPDATE')]), 1)
+        self.assertEqual([sql for sql in statements if '"description"' in sql], [])
+        saved = MenuItem.objects.get(pk=menu_item.pk)
+        self.assertEqual((saved.name, saved.description), ('Marinara', self.menu_item.description))
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_catalogue(restaurants=1, items=6)[0]
+        # The best matches are the ones nobody may order.
+        self.hidden = list(self.restaurant.menu_items.order_by('pk')[:4].values_list('pk', flat=True))
+        MenuItem.objects.filter(pk__in=self.hidden).update(name='Margherita margherita', available=False)
+        search.rebuild()
+
+    def test_limit_counts_only_the_queryset_the_caller_shows(self):
+        shown = MenuItem.objects.filter(available=True)
+        self.assertEqual(set(search.search('menu_item', 'margherita', limit=4)), set(self.hidden))
+        results = search.search('menu_item', 'margherita', among=shown, limit=4)
+        self.assertEqual(sorted(results), sorted(shown.values_list('pk', flat=True)))
+
+    def test_hidden_matches_do_not_use_up_the_limit(self):
+        limited = lambda kind, query, among=None, search=search.search: search(kind, query, among, limit=4)
+        with mock.patch('api.search.search', limited):
+            response = APIClient().get('/api/menu-items/', {'search': 'margherita'})
+        self.assertEqual(
+            sorted(item['id'] for item in response.json()['results']),
+            sorted(MenuItem.objects.filter(available=True).values_list('pk', flat=True)),
+        )
+
+class NotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurant = make_catalogue(restaurants=1)[0]
+        self.customer = make_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def messages(self):
+        return list(Notification.objects.filter(user=self.customer).order_by('id').values_list('type', 'message'))
+
+    def test_kitchen_transitions_notify_the_customer(self):
+        order_id = place_order(self.client, self.restaurant)
+        item_ids = list(OrderItem.objects.filter(order_id=order_id).values_list('id', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            kitchen.transition(item_ids[:1], 'preparing')
+        with self.captureOnCommitCallbacks(execute=True):
+            kitchen.transition(item_ids[1:], 'ready')
+        with self.captureOnCommitCallbacks(execute=True):
+            kitchen.transition(item_ids[:1], 'ready')
+        self.assertEqual(self.messages(), [
+            ('info', f'Your order #{order_id} is being prepared.'),
+            ('success', f'Your order #{order_id} is ready.'),
+        ])
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').json(), {'unread': 2})
+
+    def test_cancel_notifies_the_customer(self):
+        order_id = place_order(self.client, self.restaurant)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/orders/{order_id}/cancel/')
+        self.assertEqual(self.messages(), [('warning', f'Your order #{order_id} has been cancelled.')])
+
+    def test_mark_all_read_keeps_a_notification_that_lands_meanwhile(self):
+        notifications.create_notifications([self.customer.pk], 'info', 'first')
+        self.assertEqual(notifications.unread_count(self.customer.pk), 1)
+        # Its on_commit counter bump has not run when mark_all_read does.
+        Notification.objects.create(user=self.customer, type='info', message='late')
+        response = self.client.post('/api/notifications/mark_all_read/')
+        self.assertEqual(response.json()['updated'], 2)
+        notifications.adjust_unread(self.customer.pk, 1)
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').json(), {'unread': 0})
+
+class KitchenChangesTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_catalogue(restaurants=1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(make_customer())
+        for _ in range(3):
+            place_order(self.client, self.restaurant, lines=3)
+
+    def test_restaurant_queue_reads_the_denormalized_column(self):
+        items = kitchen.items_for(restaurant_id=self.restaurant.pk)
+        self.assertEqual(len(kitchen.queue(items)), 9)
+        self.assertIn('"api_orderitem"."restaurant_id" =', str(items.query))
+
+    def test_burst_larger_than_a_page_is_paged_through(self):
+        # Every row shares one updated_at, inside a single overlap window.
+        OrderItem.objects.update(updated_at=timezone.now())
+        items = kitchen.items_for(restaurant_id=self.restaurant.pk)
+        seen, cursor = [], kitchen.decode_cursor(kitchen.encode_cursor(timezone.now() - kitchen.CHANGES_OVERLAP * 2))
+        for _ in range(10):
+            changed, next_cursor = kitchen.changes_since(items, cursor, limit=4)
+            seen += [item.pk for item in changed]
+            cursor = kitchen.decode_cursor(next_cursor)
+            if cursor[1] is None:
+                break
+        self.assertEqual(sorted(seen), sorted(OrderItem.objects.values_list('pk', flat=True)))
+
+    def test_cursor_round_trips_to_the_microsecond(self):
+        moment = timezone.now()
+        self.assertEqual(kitchen.decode_cursor(kitchen.encode_cursor(moment, 42)), (moment, 42))
+        self.assertEqual(kitchen.decode_cursor(kitchen.encode_cursor(moment)), (moment, None))
+
+class MenuSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurant = make_catalogue(restaurants=1)[0]
+
+    def test_evicted_version_never_resurrects_an_old_snapshot(self):
+        url = f'/api/restaurants/{self.restaurant.pk}/menu/'
+        self.assertEqual(len(self.client.get(url).json()['menu']), 4)
+        MenuItem.objects.filter(pk=self.restaurant.menu_items.first().pk).update(available=False)
+        snapshots.invalidate(self.restaurant.pk)
+        self.assertEqual(len(self.client.get(url).json()['menu']), 3)
+        cache.delete(f'menu-snapshot:{self.restaurant.pk}:version')
+        self.assertEqual(len(self.client.get(url).json()['menu']), 3)
+
+class OpeningHoursTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_catalogue(restaurants=1)[0]
+
+    def set_hours(self, tz_name, *rows):
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(timezone=tz_name)
+        RestaurantHours.objects.bulk_create(
+            RestaurantHours(restaurant=self.restaurant, day=day, open_time=opens, close_time=closes)
+            for day, opens, closes in rows
+        )
+        hours.rebuild([self.restaurant.pk])
+
+    def is_open(self, moment):
+        return Restaurant.objects.open_at(moment).filter(pk=self.restaurant.pk).exists()
+
+    def test_hours_past_midnight_spill_into_the_next_day(self):
+        self.assertEqual(hours.weekly_intervals([(4, time(20), time(2))]), [(4 * 1440 + 1200, 5 * 1440 + 120)])
+        self.set_hours('UTC', (4, time(20), time(2)))
+        self.assertTrue(self.is_open(datetime(2026, 10, 24, 1, 30, tzinfo=dt_timezone.utc)))  # Saturday
+        self.assertFalse(self.is_open(datetime(2026, 10, 24, 2, 0, tzinfo=dt_timezone.utc)))
+
+    def test_sunday_night_wraps_to_monday_morning(self):
+        self.assertEqual(hours.weekly_intervals([(6, time(22), time(3))]), [(0, 180), (6 * 1440 + 1320, 10080)])
+        self.set_hours('UTC', (6, time(22), time(3)))
+        self.assertTrue(self.is_open(datetime(2026, 10, 25, 23, 0, tzinfo=dt_timezone.utc)))  # Sunday
+        self.assertTrue(self.is_open(datetime(2026, 10, 26, 2, 59, tzinfo=dt_timezone.utc)))  # Monday
+        self.assertFalse(self.is_open(datetime(2026, 10, 26, 3, 0, tzinfo=dt_timezone.utc)))
+
+    def test_hours_are_local_to_the_restaurant(self):
+        self.set_hours('Asia/Kolkata', *[(day, time(9), time(17)) for day in range(7)])
+        # 09:00 in Kolkata is 03:30 UTC.
+        self.assertFalse(self.is_open(datetime(2026, 10, 19, 3, 29, tzinfo=dt_timezone.utc)))
+        self.assertTrue(self.is_open(datetime(2026, 10, 19, 3, 30, tzinfo=dt_timezone.utc)))
+        self.assertFalse(self.is_open(datetime(2026, 10, 19, 11, 30, tzinfo=dt_timezone.utc)))
+
+    def test_open_now_etag_moves_with_the_clock(self):
+        self.set_hours('UTC', *[(day, time(9), time(17)) for day in range(7)])
+        etag = ''
+        for moment in (datetime(2026, 10, 19, 8, 59, 30), datetime(2026, 10, 19, 9, 0, 30)):
+            now = moment.replace(tzinfo=dt_timezone.utc)
+            with mock.patch('api.filters.timezone.now', return_value=now):
+                response = self.client.get('/api/restaurants/?open_now=true', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+        self.assertEqual(response.json()['count'], 1)
+
+@skipUnless(connection.vendor == 'sqlite', 'reads SQLite query plans')
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the page query each list view really runs. A plain SCAN reads
+    rows until the page fills, which is only bounded when nothing filters
+    the walk; any filtered scan fails, whatever it is ordered by.
+    """
+    def setUp(self):
+        make_catalogue(restaurants=1)
+        self.customer = make_customer()
+
+    def viewset(self, viewset_class, path, user=None, action='list', **kwargs):
+        request = Request(RequestFactory().get(path))
+        request.user = user or AnonymousUser()
+        return viewset_class(request=request, args=(), kwargs=kwargs, action=action, format_kwarg=None)
+
+    def page_query(self, viewset_class, path, user=None):
+        viewset = self.viewset(viewset_class, path, user)
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        if isinstance(viewset.paginator, CursorPagination):
+            queryset = queryset.order_by(*viewset.paginator.get_ordering(viewset.request, queryset, viewset))
+        return queryset[:api_settings.PAGE_SIZE]
+
+    def test_list_views_do_not_scan_filtered_tables(self):
+        for viewset_class, path, user in (
+            (RestaurantViewSet, '/api/restaurants/', None),
+            (RestaurantViewSet, '/api/restaurants/?open_now=true', None),
+            (RestaurantViewSet, '/api/restaurants/?search=pizza', None),
+            (TableViewSet, '/api/tables/', None),
+            (MenuItemViewSet, '/api/menu-items/', None),
+            (MenuItemViewSet, '/api/menu-items/?ordering=-rating_avg', None),
+            (MenuItemViewSet, '/api/menu-items/?search=margherita', None),
+            (OrderViewSet, '/api/orders/', self.customer),
+            (WalletViewSet, '/api/wallet/', self.customer),
+            (NotificationViewSet, '/api/notifications/', self.customer),
+        ):
+            with self.subTest(path=path):
+                queryset = self.page_query(viewset_class, path, user)
+                plan = queryset.explain()
+                scanned = FULL_SCAN_PATTERNS['sqlite'].findall(plan)
+                if not queryset.query.where:
+                    scanned = [table for table in scanned if table != queryset.model._meta.db_table]
+                self.assertEqual(scanned, [], plan)
+
+    def test_etag_validators_do_not_scan(self):
+        # These run on every request, 304s included, and always filter.
+        table = Table.objects.first()
+        for viewset_class, path, action, kwargs in (
+            (RestaurantViewSet, '/api/restaurants/', 'list', {}),
+            (RestaurantViewSet, '/api/restaurants/?fields=id,tables', 'list', {}),
+            (RestaurantViewSet, f'/api/restaurants/{table.restaurant_id}/', 'retrieve', {'pk': table.restaurant_id}),
+            (TableViewSet, '/api/tables/', 'list', {}),
+            (TableViewSet, f'/api/tables/{table.pk}/', 'retrieve', {'pk': table.pk}),
+        ):
+            with self.subTest(path=path, action=action):
+                viewset = self.viewset(viewset_class, path, action=action, **kwargs)
+                for validator in viewset.get_validators():
+                    if not isinstance(validator, QuerySet):
+                        continue
+                    plan = validator.explain()
+                    self.assertEqual(FULL_SCAN_PATTERNS['sqlite'].findall(plan), [], plan)
+
+class QueryCountTests(TestCase):
+    # Queries per request; none of them may grow with the number of rows.
+    EXPECTED = {
+        'restaurant list': 2,
+        'restaurant detail': 11,
+        'menu items': 4,
+        'orders': 3,
+        'wallet': 2,
+    }
+
+    def setUp(self):
+        self.customer = make_customer()
+        self.wallet = Wallet.objects.create(user=self.customer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def grow(self, restaurants, items, orders):
+        for restaurant in make_catalogue(restaurants=restaurants, items=items):
+            for _ in range(orders):
+                place_order(self.client, restaurant, lines=3)
+            ledger.credit(self.wallet.pk, Decimal('10.00'), 'Top up')
+
+    def assert_query_counts(self):
+        restaurant = Restaurant.objects.order_by('pk').first()
+        for name, url in (
+            ('restaurant list', '/api/restaurants/'),
+            ('restaurant detail', f'/api/restaurants/{restaurant.pk}/'),
+            ('menu items', '/api/menu-items/'),
+            ('orders', '/api/orders/'),
+            ('wallet', f'/api/wallet/{self.wallet.pk}/'),
+        ):
+            cache.clear()
+            with self.subTest(name), self.assertNumQueries(self.EXPECTED[name]):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_small_data_set(self):
+        self.grow(restaurants=2, items=4, orders=2)
+        self.assert_query_counts()
+
+    def test_large_data_set(self):
+        self.grow(restaurants=12, items=15, orders=4)
+        self.assert_query_counts()
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_catalogue(restaurants=1)[0]
+        self.customer = make_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            page = self.client.get(url).json()
+            ids += [row['id'] for row in page['results']]
+            url = page['next']
+        return ids
+
+    def test_cursor_pages_are_stable_across_tied_timestamps(self):
+        order_ids = [place_order(self.client, self.restaurant, lines=1) for _ in range(7)]
+        for _ in range(7):
+            notifications.create_notifications([self.customer.pk], 'info', 'Hello')
+        tied = timezone.now()
+        Order.objects.update(created_at=tied)
+        Notification.objects.update(created_at=tied)
+        self.assertEqual(self.walk('/api/orders/?page_size=2'), sorted(order_ids, reverse=True))
+        notification_ids = list(Notification.objects.order_by('-id').values_list('id', flat=True))
+        self.assertEqual(self.walk('/api/notifications/?page_size=2'), notification_ids)
+
+    def test_invalid_cursor_is_not_found(self):
+        for url in ('/api/orders/?', '/api/notifications/?', '/api/restaurants/nearby/?lat=18.5&lng=73.8&'):
+            # Not base64, then a well-formed cursor with an unparseable position.
+            for cursor in ('garbage', 'cD1ub3c='):
+                with self.subTest(url=url, cursor=cursor):
+                    self.assertEqual(self.client.get(f'{url}cursor={cursor}').status_code, 404)
+
+class FieldSelectionTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_catalogue(restaurants=1)[0]
+        self.customer = make_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        place_order(self.client, self.restaurant, lines=3)
+
+    def test_fields_and_expand_trim_the_prefetches(self):
+        detail = f'/api/restaurants/{self.restaurant.pk}/'
+        for url, queries in (
+            (detail, QueryCountTests.EXPECTED['restaurant detail']),
+            (detail + '?fields=id,name', 1),
+            (detail + '?fields=id,tables', 3),
+            ('/api/menu-items/', QueryCountTests.EXPECTED['menu items']),
+            ('/api/menu-items/?fields=id,name,price', 2),
+            ('/api/orders/', QueryCountTests.EXPECTED['orders']),
+            ('/api/orders/?fields=id,status', 1),
+            ('/api/orders/?expand=items.menu_item', 5),
+        ):
+            cache.clear()
+            with self.subTest(url), self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_catalogue(restaurants=1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(make_customer())
+        cache.clear()
+
+    def read_alias(self):
+        seen = []
+        def list_menu(viewset, request, *args, **kwargs):
+            seen.append(routing.ReplicaRouter().db_for_read(MenuItem))
+            return Response([])
+        with mock.patch.object(MenuItemViewSet, 'list', list_menu):
+            self.client.get('/api/menu-items/')
+        return seen[0]
+
+    def test_user_reads_from_the_primary_after_placing_an_order(self):
+        self.assertEqual(self.read_alias(), 'replica_0')
+        place_order(self.client, self.restaurant)
+        self.assertEqual(self.read_alias(), 'default')
+
+    def test_replicas_are_never_migrated(self):
+        router = routing.ReplicaRouter()
+        self.assertFalse(router.allow_migrate('replica_0', 'api'))
+        self.assertTrue(router.allow_migrate('default', 'api'))
+
+class BudgetTests(TestCase):
+    def test_budgets_are_keyed_by_method(self):
+        with override_settings(API_BUDGETS={'*': {}, 'GET order-list': {'queries': 0}}):
+            self.assertEqual(instrumentation.get_budget('GET order-list'), {'queries': 0})
+            self.assertEqual(instrumentation.get_budget('POST order-list'), {})
+
+    @override_settings(API_BUDGET_ACTION='raise')
+    def test_placing_and_listing_orders_stays_within_budget(self):
+        restaurant = make_catalogue(restaurants=1)[0]
+        customer = make_customer()
+        ledger.credit(Wallet.objects.create(user=customer).pk, Decimal('100.00'), 'Top up')
+        client = APIClient()
+        client.force_authenticate(customer)
+        response = client.post('/api/orders/', {
+            'restaurant': restaurant.pk,
+            'table': restaurant.tables.first().pk,
+            'items': [{'menu_item_id': item.pk, 'quantity': 1} for item in restaurant.menu_items.all()],
+            'pay_with_wallet': True,
+        }, format='json', headers={'Idempotency-Key': 'order-1'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(client.get('/api/orders/').status_code, 200)
+
+    def test_created_order_renders_its_lines_without_reading_them_back(self):
+        restaurant = make_catalogue(restaurants=1)[0]
+        client = APIClient()
+        client.force_authenticate(make_customer())
+        with CaptureQueriesContext(connection) as queries:
+            created = client.post('/api/orders/', {
+                'restaurant': restaurant.pk,
+                'table': restaurant.tables.first().pk,
+                'items': [{'menu_item_id': item.pk, 'quantity': 2} for item in restaurant.menu_items.all()],
+            }, format='json').json()
+        reads = [query['sql'] for query in queries if query['sql'].startswith('SELECT') and '"api_orderitem"' in query['sql']]
+        self.assertEqual(reads, [])
+        self.assertEqual(created['items'], client.get(f'/api/orders/{created["id"]}/').json()['items'])
@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     RestaurantViewSet, TableViewSet, MenuItemViewSet,
-    OrderViewSet, WalletViewSet, NotificationViewSet
+    OrderViewSet, KitchenViewSet, WalletViewSet, NotificationViewSet, metrics
 )
 
 router = DefaultRouter()
@@ -10,9 +11,21 @@ router.register(r'restaurants', RestaurantViewSet)
 router.register(r'tables', TableViewSet)
 router.register(r'menu-items', MenuItemViewSet)
 router.register(r'orders', OrderViewSet, basename='order')
+router.register(r'kitchen', KitchenViewSet, basename='kitchen')
 router.register(r'wallet', WalletViewSet, basename='wallet')
 router.register(r'notifications', NotificationViewSet, basename='notification')
 
+async_urlpatterns = [
+    path('restaurants/', async_views.restaurant_list, name='async-restaurant-list'),
+    path('restaurants/<int:pk>/', async_views.restaurant_detail, name='async-restaurant-detail'),
+    path('restaurants/<int:pk>/menu/', async_views.restaurant_menu, name='async-restaurant-menu'),
+    path('menu-items/', async_views.menu_item_list, name='async-menuitem-list'),
+    path('tables/resolve/', async_views.table_resolve, name='async-table-resolve'),
+]
+
 urlpatterns = [
+    path('events/', async_views.event_stream, name='event-stream'),
+    path('async/', include(async_urlpatterns)),
+    path('metrics/', metrics, name='metrics'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,131 +1,422 @@
+import csv
+import itertools
+import uuid
 from rest_framework import viewsets, status, filters
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
 from .models import (
-    Restaurant, Table, MenuItem, Order, Wallet, Notification
+    Restaurant, Table, Stall, MenuItem, Review, Order,
+    Wallet, WalletTransaction, Notification
 )
 from .serializers import (
-    RestaurantSerializer, TableSerializer, MenuItemSerializer,
-    OrderSerializer, WalletSerializer, NotificationSerializer
+    RestaurantSerializer, NearbyRestaurantSerializer, NearbyQuerySerializer,
+    TableSerializer, MenuItemSerializer, ReviewSerializer,
+    OrderSerializer, KitchenOrderItemSerializer, KitchenQuerySerializer,
+    KitchenTransitionSerializer, WalletSerializer, WalletTransactionSerializer,
+    WalletTransactionQuerySerializer, NotificationSerializer, NotificationIdsSerializer,
+    field_selection
 )
+from .conditional import CATALOGUE, TABLES, ConditionalGetMixin, apply_caching, bump_version, make_etag
+from .filters import FullTextSearchFilter, OpenHoursFilter
+from .idempotency import idempotent
+from .pagination import CreatedAtCursorPagination, DistanceCursorPagination
+from .routing import ReplicaReadMixin
+from . import instrumentation, kitchen, ledger, notifications, resolver, routing, snapshots
 
-class RestaurantViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Restaurant.objects.filter(is_active=True)
+RECENT_TRANSACTIONS = 5
+
+def _menu_items_for(selection, path):
+    return MenuItem.objects.for_serializer(
+        tags=selection.includes(f'{path}.tags'),
+        ingredients=selection.includes(f'{path}.ingredients'),
+    )
+
+class RestaurantViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Restaurant.objects.filter(is_active=True).order_by('pk')
     serializer_class = RestaurantSerializer
     permission_classes = [AllowAny]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['name', 'description', 'city', 'state', 'country']
+    filter_backends = [FullTextSearchFilter, OpenHoursFilter]
+    search_kind = 'restaurant'
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'retrieve':
+            # Lists are summaries unless ?expand= asks for more; the detail
+            # view keeps its nested shape by default.
+            context['default_expand'] = ('tables', 'menu', 'stalls', 'hours')
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        selection = field_selection(self.get_serializer_context())
+        if selection.wants('tables'):
+            queryset = queryset.prefetch_related('tables')
+        if selection.wants('hours'):
+            queryset = queryset.prefetch_related('hours')
+        if selection.wants('menu'):
+            queryset = queryset.prefetch_related(
+                Prefetch('menu_items', queryset=_menu_items_for(selection, 'menu'))
+            )
+        if selection.wants('stalls'):
+            stalls = Stall.objects.all()
+            if selection.includes('stalls.menu'):
+                stalls = stalls.prefetch_related(
+                    Prefetch('menu_items', queryset=_menu_items_for(selection, 'stalls.menu'))
+                )
+            queryset = queryset.prefetch_related(Prefetch('stalls', queryset=stalls))
+        return queryset
+
+    def get_version_scopes(self):
+        if field_selection(self.get_serializer_context()).wants('tables'):
+            return [CATALOGUE, TABLES]
+        return [CATALOGUE]
+
+    def get_validators(self):
+        validators = []
+        moment = OpenHoursFilter().moment(self.request)
+        if moment is not None:
+            # Restaurants open and close without a write; the set only
+            # changes on the minute.
+            validators.append(moment.replace(second=0, microsecond=0).isoformat())
+        if field_selection(self.get_serializer_context()).wants('tables'):
+            # Leases lapse without a write, so live locks are counted.
+            live_locks = Table.objects.filter(is_locked=True, locked_until__gte=timezone.now())
+            if self.action == 'retrieve':
+                live_locks = live_locks.filter(restaurant_id=self.kwargs['pk'])
+            validators.append(live_locks)
+        return validators
 
     @action(detail=True, methods=['get'])
     def tables(self, request, pk=None):
         restaurant = self.get_object()
         tables = restaurant.tables.filter(is_available=True)
-        serializer = TableSerializer(tables, many=True)
+        serializer = TableSerializer(tables, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
     def menu(self, request, pk=None):
-        restaurant = self.get_object()
-        menu_items = restaurant.menu_items.filter(available=True)
-        serializer = MenuItemSerializer(menu_items, many=True)
-        return Response(serializer.data)
+        # Served straight from the pre-rendered snapshot so a warm read
+        # never touches the database; the snapshot version is the validator.
+        try:
+            restaurant_id = int(pk)
+        except ValueError:
+            raise Http404
+        etag = make_etag('menu', restaurant_id, snapshots.SNAPSHOT_SCHEMA, snapshots.get_version(restaurant_id))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                blob = snapshots.get_menu_snapshot(restaurant_id)
+            except Restaurant.DoesNotExist:
+                raise Http404
+            response = HttpResponse(blob, content_type='application/json')
+        return apply_caching(response, etag, **self.cache_control)
 
-class TableViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Table.objects.all()
+    @action(detail=False, methods=['get'], pagination_class=DistanceCursorPagination)
+    def nearby(self, request):
+        params = NearbyQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        restaurants = Restaurant.objects.filter(is_active=True).nearby(
+            params.validated_data['lat'],
+            params.validated_data['lng'],
+            params.validated_data['radius'],
+        )
+        restaurants = OpenHoursFilter().filter_queryset(request, restaurants, self)
+        page = self.paginate_queryset(restaurants)
+        serializer = NearbyRestaurantSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+class TableViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Table.objects.order_by('pk')
     serializer_class = TableSerializer
     permission_classes = [AllowAny]
+    # Lock state changes by the second; clients revalidate on every use.
+    cache_control = {'public': True, 'no_cache': True}
+
+    version_scopes = (TABLES,)
+
+    def get_validators(self):
+        # Leases lapse without a write, so live locks are counted.
+        live_locks = Table.objects.filter(is_locked=True, locked_until__gte=timezone.now())
+        if self.action == 'retrieve':
+            live_locks = live_locks.filter(pk=self.kwargs['pk'])
+        return [live_locks]
+
+    @action(detail=False, methods=['get'])
+    def resolve(self, request):
+        qr_code = request.query_params.get('qr_code')
+        if not qr_code:
+            return Response(
+                {'error': 'qr_code is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        session = resolver.resolve(qr_code, request)
+        if session is None:
+            raise Http404
+        return Response(session)
 
     @action(detail=True, methods=['post'])
     def lock(self, request, pk=None):
         table = self.get_object()
-        if table.is_locked:
+        token = uuid.uuid4()
+        locked_until = timezone.now() + settings.TABLE_LOCK_TTL
+        user = request.user if request.user.is_authenticated else None
+        if not Table.objects.filter(pk=table.pk).acquire_lock(token, locked_until, user):
             return Response(
                 {'error': 'Table is already locked'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        table.is_locked = True
-        table.save()
-        return Response({'status': 'Table locked successfully'})
+        bump_version(TABLES)
+        return Response({
+            'status': 'Table locked successfully',
+            'lock_token': token,
+            'locked_until': locked_until,
+        })
+
+    @action(detail=True, methods=['post'])
+    def renew(self, request, pk=None):
+        table = self.get_object()
+        token = self._lock_token(request)
+        locked_until = timezone.now() + settings.TABLE_LOCK_TTL
+        if token is None or not Table.objects.filter(pk=table.pk).renew_lock(token, locked_until):
+            return self._lock_refused(table)
+        bump_version(TABLES)
+        return Response({
+            'status': 'Table lock renewed',
+            'locked_until': locked_until,
+        })
 
     @action(detail=True, methods=['post'])
     def unlock(self, request, pk=None):
         table = self.get_object()
-        if not table.is_locked:
+        token = self._lock_token(request)
+        if token is None and not request.user.is_staff:
+            released = 0
+        else:
+            released = Table.objects.filter(pk=table.pk).release_lock(token)
+        if not released:
+            return self._lock_refused(table)
+        bump_version(TABLES)
+        return Response({'status': 'Table unlocked successfully'})
+
+    def _lock_refused(self, table):
+        table.refresh_from_db(fields=['is_locked', 'locked_until'])
+        if table.lock_active:
             return Response(
-                {'error': 'Table is not locked'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': 'Lock token does not match'},
+                status=status.HTTP_403_FORBIDDEN
             )
-        table.is_locked = False
-        table.save()
-        return Response({'status': 'Table unlocked successfully'})
+        return Response(
+            {'error': 'Table is not locked'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-class MenuItemViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = MenuItem.objects.filter(available=True)
+    def _lock_token(self, request):
+        try:
+            return uuid.UUID(str(request.data.get('lock_token')))
+        except ValueError:
+            return None
+
+class MenuItemViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = MenuItem.objects.filter(available=True).order_by('pk').with_rating()
     serializer_class = MenuItemSerializer
     permission_classes = [AllowAny]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['name', 'description', 'category', 'sub_category']
+    filter_backends = [FullTextSearchFilter, filters.OrderingFilter]
+    search_kind = 'menu_item'
+    ordering_fields = ['price', 'preparation_time', 'rating_avg', 'review_count']
+
+    def get_queryset(self):
+        selection = field_selection(self.get_serializer_context())
+        queryset = super().get_queryset().for_serializer(
+            tags=selection.includes('tags'), ingredients=selection.includes('ingredients'),
+        )
+        min_rating = self.request.query_params.get('min_rating')
+        if min_rating:
+            try:
+                queryset = queryset.filter(rating_avg__gte=float(min_rating))
+            except ValueError:
+                pass
+        return queryset
+
+    @action(detail=True, methods=['get'], pagination_class=CreatedAtCursorPagination)
+    def reviews(self, request, pk=None):
+        menu_item = get_object_or_404(MenuItem.objects.only('id'), pk=pk, available=True)
+        reviews = Review.objects.filter(menu_item=menu_item).select_related('user')
+        page = self.paginate_queryset(reviews)
+        serializer = ReviewSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
 
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        queryset = Order.objects.filter(user=self.request.user).select_related('user')
+        selection = field_selection(self.get_serializer_context())
+        if not selection.includes('items'):
+            return queryset
+        if not selection.includes('items.menu_item'):
+            return queryset.prefetch_related('items')
+        if selection.expands('items.menu_item'):
+            menu_items = _menu_items_for(selection, 'items.menu_item')
+        else:
+            menu_items = MenuItem.objects.only('id', 'name', 'price', 'image', 'image_variants')
+        return queryset.prefetch_related(Prefetch('items__menu_item', queryset=menu_items))
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        routing.pin_to_primary(self.request.user.pk)
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         order = self.get_object()
-        if order.status != 'pending':
-            return Response(
-                {'error': 'Only pending orders can be cancelled'},
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            # Locked so a kitchen roll-up cannot move the order meanwhile.
+            order = Order.objects.select_for_update().filter(pk=order.pk, status='pending').first()
+            if order is None:
+                return Response(
+                    {'error': 'Only pending orders can be cancelled'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Take the lines off the kitchen queue along with the order.
+            order.items.filter(status__in=kitchen.TRANSITIONS['cancelled']).update(
+                status='cancelled', updated_at=timezone.now()
             )
-        order.status = 'cancelled'
-        order.save()
+            order.status = 'cancelled'
+            order.save()
+            # The row lock above means only one cancel gets this far.
+            ledger.refund_order(order.pk)
+            notifications.order_status_changed(order.user_id, order.pk, 'cancelled')
         return Response({'status': 'Order cancelled successfully'})
 
+class KitchenViewSet(viewsets.GenericViewSet):
+    serializer_class = KitchenOrderItemSerializer
+    permission_classes = [IsAdminUser]
+
+    def _scoped_items(self, request):
+        params = KitchenQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        items = kitchen.items_for(
+            stall_id=params.validated_data.get('stall'),
+            restaurant_id=params.validated_data.get('restaurant'),
+        )
+        return items, params.validated_data.get('since')
+
+    def list(self, request):
+        items, _ = self._scoped_items(request)
+        cursor = kitchen.encode_cursor(timezone.now())
+        queue = kitchen.queue(items)
+        return Response({
+            'items': self.get_serializer(queue, many=True).data,
+            'cursor': cursor,
+        })
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        items, since = self._scoped_items(request)
+        changed, cursor = kitchen.changes_since(items, since)
+        return Response({
+            'items': self.get_serializer(changed, many=True).data,
+            'cursor': cursor,
+        })
+
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        serializer = KitchenTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        moved = kitchen.transition(
+            serializer.validated_data['items'],
+            serializer.validated_data['status'],
+        )
+        skipped = sorted(set(serializer.validated_data['items']) - set(moved))
+        return Response({'updated': sorted(moved), 'skipped': skipped})
+
+class _Echo:
+    def write(self, value):
+        return value
+
 class WalletViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = WalletSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Wallet.objects.filter(user=self.request.user)
+        queryset = Wallet.objects.filter(user=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            recent = WalletTransaction.objects.order_by('-created_at', '-id')[:RECENT_TRANSACTIONS]
+            queryset = queryset.prefetch_related(
+                Prefetch('transactions', queryset=recent, to_attr='recent_transactions')
+            )
+        return queryset
+
+    def _filtered_transactions(self, request):
+        wallet = self.get_object()
+        params = WalletTransactionQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        transactions = wallet.transactions.all()
+        if 'since' in params.validated_data:
+            transactions = transactions.filter(created_at__gte=params.validated_data['since'])
+        if 'until' in params.validated_data:
+            transactions = transactions.filter(created_at__lt=params.validated_data['until'])
+        if 'type' in params.validated_data:
+            transactions = transactions.filter(type=params.validated_data['type'])
+        return transactions
+
+    @action(detail=True, methods=['get'], pagination_class=CreatedAtCursorPagination)
+    def transactions(self, request, pk=None):
+        page = self.paginate_queryset(self._filtered_transactions(request))
+        serializer = WalletTransactionSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        transactions = self._filtered_transactions(request).order_by('created_at', 'id').values_list(
+            'created_at', 'type', 'amount', 'description', 'reference_id'
+        )
+        writer = csv.writer(_Echo())
+        rows = itertools.chain(
+            [('created_at', 'type', 'amount', 'description', 'reference_id')],
+            transactions.iterator(chunk_size=2000),
+        )
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in rows),
+            content_type='text/csv'
+        )
+        response['Content-Disposition'] = f'attachment; filename="wallet-{pk}-statement.csv"'
+        return response
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def add_money(self, request, pk=None):
         wallet = self.get_object()
-        amount = request.data.get('amount')
-        
+
         try:
-            amount = float(amount)
-            if amount <= 0:
-                raise ValueError
-        except (TypeError, ValueError):
+            amount = ledger.parse_amount(request.data.get('amount'))
+        except ValueError:
             return Response(
                 {'error': 'Invalid amount'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        wallet.balance += amount
-        wallet.save()
-        
-        wallet.transactions.create(
-            type='credit',
-            amount=amount,
-            description='Added money to wallet'
-        )
-        
+        ledger.credit(wallet.pk, amount, 'Added money to wallet')
+
         return Response({'status': 'Money added successfully'})
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
@@ -133,6 +424,31 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         notification = self.get_object()
-        notification.read = True
-        notification.save()
-        return Response({'status': 'Notification marked as read'})
\ No newline at end of file
+        updated = Notification.objects.filter(pk=notification.pk, read=False).update(read=True)
+        notifications.adjust_unread(request.user.pk, -updated)
+        return Response({'status': 'Notification marked as read'})
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        serializer = NotificationIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = self.get_queryset().filter(
+            pk__in=serializer.validated_data['ids'], read=False
+        ).update(read=True)
+        notifications.adjust_unread(request.user.pk, -updated)
+        return Response({'status': 'Notifications marked as read', 'updated': updated})
+
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        updated = self.get_queryset().filter(read=False).update(read=True)
+        notifications.adjust_unread(request.user.pk, -updated)
+        return Response({'status': 'Notifications marked as read', 'updated': updated})
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread': notifications.unread_count(request.user.pk)})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    return Response({'endpoints': instrumentation.registry.snapshot()})
@@ -2,4 +2,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant.settings')
+# Async views run each query on a short-lived thread, which would leave
+# persistent connections behind; Django requires CONN_MAX_AGE=0 here.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+# Run under an ASGI server (e.g. `uvicorn restaurant.asgi:application`) so the
+# async /api/events/ stream and the /api/async/ catalogue views can hold
+# connections open without a thread each.
 application = get_asgi_application()
\ No newline at end of file
@@ -1,9 +1,18 @@
+import re
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from api import media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
+
+if settings.DEBUG or settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(
+            rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.*)$',
+            media.serve, {'document_root': settings.MEDIA_ROOT}
+        ),
+    ]